@@ -0,0 +1,129 @@
+import threading
+
+
+class BatchingResource:
+    """
+    Обёртка над VISA-ресурсом прибора: команды записи копятся в буфере
+    и уходят одной строкой через ';' перед первым запросом или явным flush().
+    При enabled = False каждая команда уходит сразу.
+    """
+
+    def __init__(self, resource, max_length=256, enabled=True):
+        self._resource = resource
+        self._max_length = max_length
+        self.enabled = enabled
+        self._pending = list()
+        self._pending_length = 0
+        self._lock = threading.RLock()
+
+        self.commands = 0
+        self.writes = 0
+
+    def write(self, command, *args, **kwargs):
+        command = command.strip()
+        if not command.startswith((':', '*')):
+            # каждая команда в составной строке адресуется от корня дерева SCPI
+            command = ':' + command
+        with self._lock:
+            if not self.enabled:
+                self.flush()
+                self._resource.write(command)
+                self.commands += 1
+                self.writes += 1
+                return len(command)
+            if self._pending and self._pending_length + len(command) + 1 > self._max_length:
+                self.flush()
+            self._pending.append(command)
+            self._pending_length += len(command) + 1
+            self.commands += 1
+        return len(command)
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._resource.write(';'.join(self._pending))
+            self._pending.clear()
+            self._pending_length = 0
+            self.writes += 1
+
+    def query(self, *args, **kwargs):
+        with self._lock:
+            self.flush()
+            return self._resource.query(*args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        with self._lock:
+            self.flush()
+            return self._resource.read(*args, **kwargs)
+
+    def __getattr__(self, item):
+        attr = getattr(self._resource, item)
+        if callable(attr):
+            def flushing(*args, **kwargs):
+                self.flush()
+                return attr(*args, **kwargs)
+            return flushing
+        return attr
+
+
+class CommandBatcher:
+    def __init__(self, enabled=True, log=False):
+        self._enabled = enabled
+        self.log = log
+        self._resources = dict()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        # действует и на уже подключённые приборы, без переподключения
+        self._enabled = value
+        for resource in self._resources.values():
+            resource.enabled = value
+
+    def attach(self, instruments):
+        self._resources.clear()
+        for name, instrument in instruments.items():
+            self.attach_one(name, instrument)
+
+    def attach_one(self, name, instrument):
+        self._resources.pop(name, None)
+        resource = getattr(instrument, '_inst', None)
+        if resource is None or not hasattr(resource, 'write'):
+            if self._enabled:
+                print(f'command batching not supported for {name}')
+            return
+        if not isinstance(resource, BatchingResource):
+            resource = BatchingResource(resource)
+            instrument._inst = resource
+        resource.enabled = self._enabled
+        self._resources[name] = resource
+
+    def flush(self, name=None):
+        if name is not None:
+            if name in self._resources:
+                self._resources[name].flush()
+            return
+        for resource in self._resources.values():
+            resource.flush()
+
+    def reset_stats(self):
+        for resource in self._resources.values():
+            resource.commands = 0
+            resource.writes = 0
+
+    def stats(self):
+        return {
+            name: {'commands': r.commands, 'writes': r.writes, 'saved': r.commands - r.writes}
+            for name, r in self._resources.items()
+        }
+
+    def report(self):
+        if not self.log:
+            return
+        stats = self.stats()
+        saved = sum(s['saved'] for s in stats.values())
+        print(f'batched writes saved: {saved} ({stats})')
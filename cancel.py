@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class Cancelled(BaseException):
+    """
+    Измерение прервано оператором или по бюджету времени.
+    Наследуется от BaseException, чтобы его не перехватывали запасные ветки вида except Exception.
+    """
+
+
+class BudgetExceeded(Cancelled):
+    pass
+
+
+class CancelToken:
+    """
+    Флаг отмены, который поток измерения проверяет между шагами, и бюджет времени текущей фазы.
+    Паузы через sleep() прерываются сразу после cancel().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._reason = ''
+        self.phase = ''
+        self.deadline = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def reason(self):
+        return self._reason
+
+    def cancel(self, reason='aborted by operator'):
+        self._reason = reason
+        self._event.set()
+
+    def reset(self):
+        self._event.clear()
+        self._reason = ''
+        self.phase = ''
+        self.deadline = None
+
+    def start_phase(self, phase, budget=0.0):
+        """
+        Начало фазы с бюджетом budget секунд, 0 -- без ограничения.
+        """
+        self.phase = phase
+        self.deadline = time.monotonic() + budget if budget > 0 else None
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self._reason)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            # перерасход бюджета -- та же отмена: cancelled и reason видны вызывающему после выхода
+            self._reason = f'{self.phase} time budget exceeded'
+            self._event.set()
+            raise BudgetExceeded(self._reason)
+
+    def sleep(self, duration):
+        self.check()
+        if self.deadline is not None:
+            duration = min(duration, max(self.deadline - time.monotonic(), 0.0))
+        self._event.wait(duration)
+        self.check()
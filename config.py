@@ -0,0 +1,279 @@
+import ast
+import os
+import pickle
+import threading
+
+# ключ: (тип, значение по умолчанию)
+SETTINGS = {
+    'important': (float, 0.3),
+    'unimportant': (float, 0.3),
+    'settle': (bool, True),
+    'settle_tolerance': (float, 0.1),
+    'settle_current_tolerance': (float, 0.001),
+    'settle_interval': (float, 0.05),
+    'settle_timeout': (float, 1.0),
+    'find_timeout': (float, 5.0),
+    'budget_check': (float, 0.0),
+    'budget_supply': (float, 0.0),
+    'budget_setup': (float, 0.0),
+    'budget_important': (float, 0.0),
+    'budget_unimportant': (float, 0.0),
+    'health_interval': (float, 10.0),
+    'reconnect_attempts': (int, 3),
+    'reconnect_backoff': (float, 0.5),
+    'batch': (bool, True),
+    'batch_log': (bool, False),
+    'shadow': (bool, True),
+    'warm_start': (bool, True),
+    'fused_check': (bool, True),
+    'multitone': (bool, True),
+    'multitone_span': (float, 20.0),
+    'multitone_margin': (float, 0.5),
+    'multitone_search': (float, 0.1),
+    'list_sweep': (bool, False),
+    'iip3_dwell': (float, 0.01),
+    'profile': (bool, True),
+    'profile_size': (int, 100_000),
+    'profile_dir': (str, ''),
+    'record': (bool, False),
+    'record_dir': (str, 'sessions'),
+    'store': (bool, True),
+    'store_path': (str, 'results.sqlite'),
+    'server': (bool, False),
+    'server_host': (str, '127.0.0.1'),
+    'server_port': (int, 5025),
+    'server_path': (str, ''),
+}
+
+# параметры типа прибора: (допустимые типы, значение по умолчанию);
+# None -- параметр обязателен, 'optional' -- может отсутствовать и тогда равен None
+DEVICE_PARAMS = {
+    'F1': ((int, float), None),
+    'F2': ((int, float), None),
+    'F3': ((int, float), None),
+    'F4': ((int, float), None),
+    'F5': ((int, float), None),
+    'F6': ((int, float), None),
+    'F7': ((int, float), None),
+    'F8': ((int, float), None),
+    'P1': ((int, float), None),
+    'P2': ((int, float), None),
+    'Pcheck': ((int, float), None),
+    'level': ((int, float), None),
+    'Imin': ((int, float, type(None)), 'optional'),
+    'Imax': ((int, float, type(None)), 'optional'),
+    'att': ((int, float), 30),
+    'tolerance': ((int, float), 0.0),
+    'min_reps': ((int, ), 5),
+    'max_reps': ((int, ), 5),
+}
+
+INSTRUMENTS = ('Источник', 'Генератор 1', 'Генератор 2', 'Анализатор')
+
+FACTORIES = {
+    'SourceFactory': ('instr.instrumentfactory', 'SourceFactory'),
+    'GeneratorFactory': ('instr.instrumentfactory', 'GeneratorFactory'),
+    'AnalyzerFactory': ('instr.instrumentfactory', 'AnalyzerFactory'),
+    'SimSourceFactory': ('siminstr', 'SimSourceFactory'),
+    'SimGeneratorFactory': ('siminstr', 'SimGeneratorFactory'),
+    'SimAnalyzerFactory': ('siminstr', 'SimAnalyzerFactory'),
+}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _parse_bool(value):
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f'not a boolean: {value!r}')
+
+
+def parse_settings(text, path='settings.ini'):
+    settings = {key: default for key, (_, default) in SETTINGS.items()}
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        if not sep:
+            raise ConfigError(f'{path}:{number}: expected key=value, got {line!r}')
+        if key not in SETTINGS:
+            raise ConfigError(f'{path}:{number}: unknown setting {key!r}')
+        kind = SETTINGS[key][0]
+        try:
+            settings[key] = _parse_bool(value) if kind is bool else kind(value.strip())
+        except ValueError as ex:
+            raise ConfigError(f'{path}:{number}: bad value for {key}: {ex}') from ex
+    return settings
+
+
+def validate_device(name, params, path='params.ini'):
+    if not isinstance(params, dict):
+        raise ConfigError(f'{path}: {name}: expected a dict of parameters')
+    unknown = set(params) - set(DEVICE_PARAMS)
+    if unknown:
+        raise ConfigError(f'{path}: {name}: unknown parameters {sorted(unknown)}')
+    result = dict()
+    for key, (kinds, default) in DEVICE_PARAMS.items():
+        if key not in params:
+            if default is None:
+                raise ConfigError(f'{path}: {name}: missing parameter {key!r}')
+            result[key] = None if default == 'optional' else default
+            continue
+        value = params[key]
+        if isinstance(value, bool) or not isinstance(value, kinds):
+            raise ConfigError(f'{path}: {name}: bad value for {key}: {value!r}')
+        result[key] = value
+    if not 1 <= result['min_reps'] <= result['max_reps']:
+        raise ConfigError(f'{path}: {name}: expected 1 <= min_reps <= max_reps')
+    return result
+
+
+def parse_params(text, path='params.ini'):
+    try:
+        raw = ast.literal_eval(text)
+    except (ValueError, SyntaxError) as ex:
+        raise ConfigError(f'{path}: {ex}') from ex
+    if not isinstance(raw, dict) or not raw:
+        raise ConfigError(f'{path}: expected a non-empty dict of device types')
+    return {str(name): validate_device(name, params, path) for name, params in raw.items()}
+
+
+def parse_instruments(text, path='instr.ini'):
+    """
+    Разбор instr.ini без eval: допускается только словарь вида {'имя': Фабрика('адрес'), ...}.
+    Возвращает {имя: (имя фабрики, адрес)}.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval').body
+    except SyntaxError as ex:
+        raise ConfigError(f'{path}: {ex}') from ex
+    if not isinstance(tree, ast.Dict):
+        raise ConfigError(f'{path}: expected a dict of instruments')
+
+    spec = dict()
+    for key, value in zip(tree.keys, tree.values):
+        try:
+            name = ast.literal_eval(key)
+        except ValueError:
+            name = None
+        if not (isinstance(value, ast.Call) and isinstance(value.func, ast.Name)
+                and value.func.id in FACTORIES and len(value.args) == 1 and not value.keywords):
+            raise ConfigError(f'{path}: {name}: expected Factory(\'address\')')
+        try:
+            addr = ast.literal_eval(value.args[0])
+        except ValueError:
+            addr = None
+        if not isinstance(name, str) or not isinstance(addr, str):
+            raise ConfigError(f'{path}: {name}: instrument name and address must be strings')
+        spec[name] = (value.func.id, addr)
+
+    missing = [name for name in INSTRUMENTS if name not in spec]
+    if missing:
+        raise ConfigError(f'{path}: missing instruments {missing}')
+    return spec
+
+
+def make_instruments(spec):
+    import importlib
+
+    return {
+        name: getattr(importlib.import_module(FACTORIES[factory][0]), FACTORIES[factory][1])(addr)
+        for name, (factory, addr) in spec.items()
+    }
+
+
+class Config:
+    """
+    Конфигурация контроллера из settings.ini, params.ini и instr.ini.
+    Разобранные и проверенные файлы кешируются в .config.cache по (путь, mtime, размер);
+    reload() перечитывает только изменившиеся файлы и подменяет конфигурацию целиком
+    или, при ошибке в любом из файлов, оставляет прежнюю.
+    """
+
+    parsers = {
+        'settings': ('settings.ini', parse_settings),
+        'params': ('params.ini', parse_params),
+        'instruments': ('instr.ini', parse_instruments),
+    }
+
+    def __init__(self, folder='.', cache='.config.cache', files=None):
+        self._folder = folder
+        # имена файлов можно переопределить, например свой instr.ini для каждого стенда
+        self._files = {name: filename for name, (filename, _) in self.parsers.items()}
+        self._files.update(files or dict())
+        self._cache_path = os.path.join(folder, cache)
+        self._lock = threading.Lock()
+        # () не совпадает ни с одним ключом, первый reload() разбирает все файлы
+        self._keys = dict.fromkeys(self.parsers, ())
+        self._values = dict.fromkeys(self.parsers)
+        self.settings = parse_settings('')
+        self.params = None
+        self.instruments = None
+
+    def _path(self, name):
+        return os.path.join(self._folder, self._files[name])
+
+    def _key(self, name):
+        try:
+            stat = os.stat(self._path(name))
+        except OSError:
+            return None
+        return os.path.abspath(self._path(name)), stat.st_mtime_ns, stat.st_size
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+            return dict()
+
+    def _save_cache(self, cache):
+        try:
+            with open(self._cache_path, 'wb') as f:
+                pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as ex:
+            print(f'could not write config cache: {ex}')
+
+    def changed(self):
+        return any(self._key(name) != self._keys.get(name) for name in self.parsers)
+
+    def reload(self):
+        """
+        Возвращает список изменившихся частей конфигурации ('settings', 'params', 'instruments').
+        """
+        with self._lock:
+            keys = {name: self._key(name) for name in self.parsers}
+            changed = [name for name in self.parsers if keys[name] != self._keys.get(name)]
+            if not changed:
+                return []
+
+            cache = self._load_cache()
+            values = dict(self._values)
+            for name in changed:
+                key = keys[name]
+                if key is None:
+                    values[name] = None
+                    continue
+                cached = cache.get(name)
+                if cached is not None and cached[0] == key:
+                    values[name] = cached[1]
+                    continue
+                parse = self.parsers[name][1]
+                with open(self._path(name), 'rt', encoding='utf-8') as f:
+                    values[name] = parse(f.read(), self._files[name])
+                cache[name] = (key, values[name])
+            self._save_cache(cache)
+
+            self._keys = keys
+            self._values = values
+            self.settings = values['settings'] or parse_settings('')
+            self.params = values['params']
+            self.instruments = values['instruments']
+            return changed
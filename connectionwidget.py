@@ -15,13 +15,18 @@ class ConnectTask(QRunnable):
         self.kwargs = kwargs
 
     def run(self):
-        self.fn(*self.args, **self.kwargs)
-        self.end()
+        try:
+            self.fn(*self.args, **self.kwargs)
+        finally:
+            self.end()
 
 
 class ConnectionWidget(QWidget):
 
     connected = pyqtSignal()
+    # поиск приборов идёт в потоках пула, виджеты обновляются только в потоке GUI через сигналы
+    instrumentFound = pyqtSignal(str, str)
+    connectFinished = pyqtSignal()
 
     def __init__(self, parent=None, controller=None):
         super().__init__(parent=parent)
@@ -35,6 +40,9 @@ class ConnectionWidget(QWidget):
             for k, v in self._controller.requiredInstruments.items()
         }
 
+        self.instrumentFound.connect(self.on_instrumentFound)
+        self.connectFinished.connect(self.connectTaskComplete)
+
         self._setupUi()
 
     def _setupUi(self):
@@ -44,11 +52,28 @@ class ConnectionWidget(QWidget):
     @pyqtSlot()
     def on_btnConnect_clicked(self):
         print('connect')
+        if not self._controller.acquire('GUI'):
+            print(f'station is busy: {self._controller.busy_owner}')
+            return
+
+        def done():
+            self._controller.release()
+            self.connectFinished.emit()
 
         self._threads.start(ConnectTask(self._controller.connect,
-                                        self.connectTaskComplete,
-                                        {k: w.address for k, w in self._widgets.items()}))
+                                        done,
+                                        {k: w.address for k, w in self._widgets.items()},
+                                        on_found=self._onFound))
 
+    def _onFound(self, name, instrument):
+        # вызывается из потока поиска
+        self.instrumentFound.emit(name, instrument.status if instrument else 'не найден')
+
+    @pyqtSlot(str, str)
+    def on_instrumentFound(self, name, status):
+        self._widgets[name].status = status
+
+    @pyqtSlot()
     def connectTaskComplete(self):
         if not self._controller.found:
             print('connect error, check connection')
@@ -0,0 +1,133 @@
+import numpy as np
+
+
+def fit_lines(pin, *curves):
+    """
+    Прямые Pout = k * Pin + b по методу наименьших квадратов сразу для всех кривых.
+    Возвращает массивы наклонов и смещений в порядке кривых.
+    """
+    pin = np.asarray(pin, dtype=float)
+    a = np.column_stack([pin, np.ones_like(pin)])
+    y = np.column_stack([np.asarray(c, dtype=float) for c in curves])
+    (slopes, offsets), *_ = np.linalg.lstsq(a, y, rcond=None)
+    return slopes, offsets
+
+
+def calc_iip3(pin, fund, im3, other):
+    """
+    IIP3 по продукту 3-го порядка 2f2 - f1 при прогоне мощности pin тона f2 и постоянной
+    мощности other тона f1: Pim3 = 2 * P2 + P1 + G - 2 * IIP3, Pfund = P2 + G,
+    откуда IIP3 = (P1 + P2 + Pfund - Pim3) / 2. Выходные уровни берутся с прямых МНК
+    в середине прогона; наклоны (ниже компрессии около 1 и 2) -- для контроля.
+    Возвращает словарь с наклонами, IIP3 и OIP3 в дБм.
+    """
+    pin = np.asarray(pin, dtype=float)
+    (k1, k3), (b1, b3) = fit_lines(pin, fund, im3)
+    p2 = pin.mean()
+    fund_out = k1 * p2 + b1
+    im3_out = k3 * p2 + b3
+    iip3 = (other + p2 + fund_out - im3_out) / 2
+    return {
+        'slope_fund': float(k1),
+        'slope_im3': float(k3),
+        'iip3': float(iip3),
+        'oip3': float(iip3 + fund_out - p2),
+    }
+
+
+def segment_means(trace, count, guard=0.25):
+    """
+    Делит трассу нулевой полосы на count равных участков (по одному на точку списка)
+    и усредняет каждый без краёв шириной guard, где генератор ещё перестраивается.
+    """
+    trace = np.asarray(trace, dtype=float)
+    per_point = len(trace) // count
+    if per_point < 1:
+        raise ValueError(f'trace of {len(trace)} points is too short for {count} list points')
+    segments = trace[:per_point * count].reshape(count, per_point)
+    skip = int(per_point * guard)
+    if skip * 2 >= per_point:
+        skip = 0
+    return segments[:, skip:per_point - skip].mean(axis=1)
+
+
+class ListSweep:
+    """
+    Прогон мощности генератора в режиме списка: весь список загружается одной
+    командой и запускается одним триггером, анализатор в нулевой полосе
+    записывает отклик за одну развёртку.
+
+    Развёртка анализатора запускается от генератора: анализатор взводится с внешним
+    триггером, выход триггера генератора (начало списка) соединён со входом EXT TRIG анализатора.
+    Без этого соединения *OPC? не дождётся развёртки и прогон завершится ошибкой,
+    а очередь вывода анализатора будет очищена. Поэтому режим включается только
+    на стендах с этим кабелем (list_sweep в settings.ini).
+    """
+
+    def __init__(self, gen, analyzer, dwell=0.01, points_per_step=20, flush=None):
+        self._gen = gen
+        self._analyzer = analyzer
+        self._flush = flush
+        self.dwell = dwell
+        self.points_per_step = points_per_step
+
+    def run(self, freq, powers, read_freq=None):
+        """
+        Прогон генератора на частоте freq, отклик снимается на read_freq (по умолчанию freq).
+        """
+        read_freq = freq if read_freq is None else read_freq
+        gen = self._gen
+        analyzer = self._analyzer
+        count = len(powers)
+        sweep_time = self.dwell * count
+
+        gen.send(':LIST:TYPE LIST')
+        gen.send(f':LIST:FREQ {",".join([f"{freq}GHz"] * count)}')
+        gen.send(f':LIST:POW {",".join(f"{p}dBm" for p in powers)}')
+        gen.send(f':LIST:DWEL {self.dwell}')
+        gen.send(':LIST:TRIG:SOUR IMM')
+        gen.send(':FREQ:MODE LIST')
+        gen.send(':POW:MODE LIST')
+        gen.send(':INIT:CONT OFF')
+
+        points = analyzer.query(':SENS:SWE:POIN?').strip()
+        analyzer.send(f':SENS:FREQ:CENT {read_freq}GHz')
+        analyzer.send(':SENS:FREQ:SPAN 0Hz')
+        analyzer.send(f':SENS:SWE:POIN {count * self.points_per_step}')
+        analyzer.send(f':SENS:SWE:TIME {sweep_time}s')
+        analyzer.send(':TRIG:SOUR EXT')
+        analyzer.send(':INIT:CONT OFF')
+
+        try:
+            # анализатор взводится первым и ждёт начала списка
+            analyzer.send(':INIT:IMM')
+            self._flush_all()
+            gen.send(':INIT')
+            self._flush_all()
+            analyzer.query('*OPC?')
+            trace = analyzer.query(':TRAC:DATA? TRACE1').split(',')
+        except Exception:
+            # поздний ответ *OPC? остался бы в очереди вывода и сдвинул все следующие ответы
+            self._clear()
+            raise
+        finally:
+            gen.send(':FREQ:MODE CW')
+            gen.send(':POW:MODE FIX')
+            analyzer.send(':TRIG:SOUR IMM')
+            analyzer.send(f':SENS:SWE:POIN {points}')
+            analyzer.send(':SENS:SWE:TIME:AUTO ON')
+            analyzer.send(':INIT:CONT ON')
+
+        return segment_means(trace, count)
+
+    def _clear(self):
+        resource = getattr(self._analyzer, '_inst', None)
+        clear = getattr(resource, 'clear', None)
+        if clear is not None:
+            # device clear очищает очередь вывода прибора
+            clear()
+        self._analyzer.send('*CLS')
+
+    def _flush_all(self):
+        if self._flush is not None:
+            self._flush()
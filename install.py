@@ -1,3 +1,4 @@
 import subprocess
 
 subprocess.run(['pyinstaller', '--onedir', 'measure.py', '--clean'])
+subprocess.run(['pyinstaller', '--onedir', 'measurecli.py', '--clean'])
@@ -1,15 +1,44 @@
-import ast
+import atexit
+import concurrent.futures
+import os
+import threading
 import time
-from os.path import isfile
-from PyQt5.QtCore import QObject, pyqtSlot
+from collections import defaultdict
 
 from instr.instrumentfactory import SourceFactory, GeneratorFactory, AnalyzerFactory, mock_enabled
+from config import Config, ConfigError, make_instruments, validate_device
+from batching import CommandBatcher
+from cancel import Cancelled, CancelToken
 from measureresult import MeasureResult, MeasureResultMock
-
-
-class InstrumentController(QObject):
-    def __init__(self, parent=None):
-        super().__init__(parent=parent)
+from settle import Settler
+from shadow import ShadowedInstrument
+from measureplan import compile_plan, PlanExecutor
+from pointbuffer import PointBuffer
+from repeats import Repeats
+from sessionpool import InstrumentLost, SessionPool
+from resultstore import ResultStore
+from profiler import CommandProfiler, TimedInstrument
+from tones import sweep_window, extract_tone_powers
+from iip3 import ListSweep, calc_iip3
+
+
+# выключение ВЧ- и питающих выходов, остальная настройка приборов при этом сохраняется
+OUTPUTS_OFF = {
+    'Генератор 1': lambda i: i.set_output(state='OFF'),
+    'Генератор 2': lambda i: i.set_output(state='OFF'),
+    'Источник': lambda i: i.set_output(chan=1, state='OFF'),
+}
+
+
+# контроллер не зависит от Qt, чтобы его можно было запускать без GUI (measurecli.py);
+# parent оставлен для совместимости с вызовом из MainWindow.
+# station -- имя стенда при работе под supervisor.py: свой файл приборов instr,
+# свои кеш настроек и файл сессий; store=False -- результаты сохраняет владелец контроллера
+class InstrumentController:
+    def __init__(self, parent=None, instr=None, station='', store=True):
+        self._parent = parent
+        self.station = station
+        self._use_store = store
 
         self.requiredInstruments = {
             'Источник': SourceFactory('GPIB0::5::INSTR'),
@@ -33,63 +62,355 @@ class InstrumentController(QObject):
                 'Pcheck': -10,
                 'level': -20,
                 'Imin': None,
-                'Imax': None
+                'Imax': None,
+                'att': 30,
             },
         }
+        self.deviceParams = {k: validate_device(k, v, 'built-in') for k, v in self.deviceParams.items()}
 
         self.secondaryParams = {
             'important': False,
         }
 
         self._instruments = dict()
-        settings = dict()
+        self._shadows = dict()
+        # приборы, которые не удалось переподключить; попытки повторяются перед каждым образцом
+        self._lost = set()
 
         self.result = MeasureResultMock()
         self.found = False
         self.present = False
+        self.serial = ''
+        self.lot = ''
         self.span = 1
 
-        if isfile('./params.ini'):
-            with open('./params.ini', 'rt', encoding='utf-8') as f:
-                raw = ''.join(f.readlines())
-                self.deviceParams = ast.literal_eval(raw)
-
-        if isfile('./instr.ini'):
-            with open('./instr.ini', 'rt', encoding='utf-8') as f:
-                raw = ''.join(f.readlines())
-                self.requiredInstruments = eval(raw)
-
-        if isfile('./settings.ini'):
-            with open('./settings.ini', 'rt', encoding='utf-8') as f:
-                for line in f.readlines():
-                    if not line:
-                        continue
-                    key, value = line.strip().split('=')
-                    settings[key] = value
-
-        self.sleep_important = float(settings.get('important', '0.3'))
-        self.sleep_unimportant = float(settings.get('unimportant', '0.3'))
+        self.sleep_important = 0.3
+        self.sleep_unimportant = 0.3
+
+        # стенд занимает один владелец за раз: 'GUI', 'lot' или 'remote'
+        self._busy = threading.Lock()
+        self.busy_owner = ''
+
+        # отмена и бюджеты времени фаз (с), 0 -- без ограничения
+        self.cancel = CancelToken()
+        self.budgets = dict()
+
+        self._settler = Settler(cancel=self.cancel)
+        self.settle_current_tolerance = 0.001
+
+        self.find_timeout = 5.0
+        self.sessions = SessionPool(f'.sessions.{station}.json' if station else '.sessions.json')
+
+        # сброс приборов после измерения идёт в фоне и перекрывается с подготовкой следующего
+        self.overlap_teardown = False
+        # тёплый старт: между образцами выключаются только выходы, *RST -- на границах партии и после ошибок
+        self.warm_start = True
+        self._needs_reset = True
+        # проверка наличия образца -- первый шаг измерения (check_measure) в партиях и без GUI
+        self.fused_check = True
+        self._teardown_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        self._pending = dict()
+
+        self._batcher = CommandBatcher()
+        self.shadow_enabled = True
+
+        self.profiler = CommandProfiler()
+        self.profile_dir = ''
+
+        # запись обмена с приборами в файл сессии для повтора (scpisession.py)
+        self.record = False
+        self.record_dir = 'sessions'
+        self.recorder = None
+
+        # ширина полосы, запас по краям и окно поиска пика -- в МГц
+        self.multitone = True
+        self.multitone_span = 20.0
+        self.multitone_margin = 0.5
+        self.multitone_search = 0.1
+        self._multitone_unsupported = False
+
+        # прогон по списку требует кабеля запуска генератор -> EXT TRIG анализатора
+        self.list_sweep = False
+        self.iip3_dwell = 0.01
+        self._list_sweep_unsupported = False
+        self._sweep_time_unsupported = False
+        # время развёртки анализатора по настройке полосы: ('span', МГц) или ('window', начало, конец);
+        # сбрасывается при *RST, переподключении и прогоне по списку, который меняет число точек
+        self._sweep_key = None
+        self._sweep_times = dict()
+
+        self.readings = defaultdict(list)
+        self.points = PointBuffer()
+        # число выполненных проходов по циклам: 'important', 'unimportant'
+        self.reps = dict()
+        self._repeats = None
+
+        self.store = None
+
+        self._plans = dict()
+        self._executor = PlanExecutor({
+            'gen': self._step_gen,
+            'tones': self._step_tones,
+            'iip3': self._step_iip3,
+        }, check=self.cancel.check)
+
+        self.config = Config(
+            cache=f'.config.{station}.cache' if station else '.config.cache',
+            files={'instruments': instr} if instr else None,
+        )
+        self.reload_config()
 
     def __str__(self):
         return f'{self._instruments}'
 
-    def connect(self, addrs):
+    def connect(self, addrs, on_found=None):
         print(f'searching for {addrs}')
+        self.cancel.reset()
         for k, v in addrs.items():
             self.requiredInstruments[k].addr = v
-        self.found = self._find()
-
-    def _find(self):
-        self._instruments = {
-            k: v.find() for k, v in self.requiredInstruments.items()
+        self.found = self._find(on_found)
+
+    def _find(self, on_found=None):
+        # каждый прибор ищется в своём потоке со своим таймаутом,
+        # зависший поиск по одному адресу не задерживает остальные;
+        # исправные открытые сессии по тем же адресам используются повторно
+        self._instruments = {k: None for k in self.requiredInstruments}
+        self._lost.clear()
+
+        reused = dict()
+        for name, factory in self.requiredInstruments.items():
+            instrument = self.sessions.get(name, factory.addr)
+            if instrument is not None:
+                print(f'{name} session reused')
+                reused[name] = instrument
+                if on_found is not None:
+                    on_found(name, instrument)
+        self._instruments.update(reused)
+
+        to_find = {k: v for k, v in self.requiredInstruments.items() if k not in reused}
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(to_find), 1))
+        futures = {pool.submit(self.sessions.open, v, k): k for k, v in to_find.items()}
+        deadline = time.monotonic() + self.find_timeout
+        pending = set(futures)
+        try:
+            # ожидание короткими отрезками, чтобы поиск можно было прервать
+            while pending and not self.cancel.cancelled and time.monotonic() < deadline:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=min(0.1, max(deadline - time.monotonic(), 0.0)),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    try:
+                        instrument = future.result()
+                    except Exception as ex:
+                        print(f'error searching for {name}: {ex}')
+                        instrument = None
+                    self._instruments[name] = instrument
+                    if on_found is not None:
+                        on_found(name, instrument)
+            for future in pending:
+                name = futures[future]
+                if self.cancel.cancelled:
+                    print(f'search for {name} cancelled')
+                else:
+                    print(f'{name} timed out after {self.find_timeout} s')
+                if on_found is not None:
+                    on_found(name, None)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        found = all(self._instruments.values())
+        if found:
+            self._needs_reset = True
+            self._start_recording()
+            self._batcher.attach(dict())
+            for name, instrument in list(self._instruments.items()):
+                self._wrap(name, instrument)
+        return found
+
+    def _start_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if not self.record:
+            return
+        from scpisession import SessionRecorder, describe_driver
+
+        suffix = f'-{self.station}' if self.station else ''
+        path = os.path.join(self.record_dir, f'{time.strftime("%Y%m%d-%H%M%S")}{suffix}.scpi.gz')
+        self.recorder = SessionRecorder(path, {
+            name: {
+                'addr': factory.addr,
+                'idn': self.sessions.known(name).get('idn'),
+                'driver': describe_driver(self._instruments[name]),
+            }
+            for name, factory in self.requiredInstruments.items()
+        })
+        atexit.register(self.recorder.close)
+        print(f'recording instrument session to {path}')
+
+    def _wrap(self, name, instrument):
+        # новое подключение -- теневое состояние прибора начинается с нуля
+        if self.recorder is not None:
+            self.recorder.attach(name, instrument)
+        self._batcher.attach_one(name, instrument)
+        self._shadows[name] = ShadowedInstrument(instrument, enabled=self.shadow_enabled)
+        if name == 'Анализатор':
+            self._forget_sweep_time()
+        self._instruments[name] = TimedInstrument(name, self._shadows[name], self.profiler)
+
+    def _heal(self):
+        """
+        Проверка связи между образцами: отвалившиеся приборы переподключаются по одному,
+        остальные сессии не трогаются. Приборы, сброс которых ещё идёт, проверяются в следующий раз.
+        Если прибор переподключить не удалось, проверка или измерение прерываются InstrumentLost,
+        а переподключение повторяется при следующем вызове.
+        """
+        if not self.found and not self._lost:
+            return
+        busy = {name for name, future in self._pending.items() if not future.done()}
+        names = [name for name in self._instruments if name not in busy and name not in self._lost]
+        for name in self.sessions.check(names):
+            print(f'{name} is not responding')
+            self._lost.add(name)
+        for name in sorted(self._lost):
+            instrument = self.sessions.reconnect(self.requiredInstruments[name], name)
+            if instrument is None:
+                print(f'{name} reconnect failed')
+                continue
+            self._lost.discard(name)
+            self._wrap(name, instrument)
+            print(f'{name} reconnected')
+        self.found = not self._lost
+        if self._lost:
+            raise InstrumentLost(f'instruments not responding: {", ".join(sorted(self._lost))}')
+
+    def _run_parallel(self, *tasks):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+            for future in [pool.submit(task) for task in tasks]:
+                future.result()
+
+    def reload_config(self):
+        """
+        Перечитывает изменившиеся файлы конфигурации. Вызывается перед проверкой и измерением,
+        поэтому новые параметры действуют со следующего образца; соединение с приборами сохраняется,
+        новые адреса из instr.ini используются при следующем подключении.
+        """
+        try:
+            changed = self.config.reload()
+        except (ConfigError, OSError) as ex:
+            print(f'config error, keeping previous configuration: {ex}')
+            return []
+        if not changed:
+            return []
+
+        print(f'config loaded: {changed}')
+        if 'settings' in changed:
+            self._apply_settings(self.config.settings)
+        if 'params' in changed and self.config.params is not None:
+            self.deviceParams = self.config.params
+            self._plans.clear()
+        if 'instruments' in changed and self.config.instruments is not None:
+            self.requiredInstruments = make_instruments(self.config.instruments)
+        return changed
+
+    def _apply_settings(self, settings):
+        self.sleep_important = settings['important']
+        self.sleep_unimportant = settings['unimportant']
+
+        self._settler.tolerance = settings['settle_tolerance']
+        self._settler.interval = settings['settle_interval']
+        self._settler.timeout = settings['settle_timeout']
+        self._settler.enabled = settings['settle']
+        self.settle_current_tolerance = settings['settle_current_tolerance']
+
+        self.find_timeout = settings['find_timeout']
+        self.budgets = {
+            phase: settings[f'budget_{phase}'] for phase in ('check', 'supply', 'setup', 'important', 'unimportant')
         }
-        return all(self._instruments.values())
+        self.sessions.health_interval = settings['health_interval']
+        self.sessions.attempts = settings['reconnect_attempts']
+        self.sessions.backoff = settings['reconnect_backoff']
+
+        self._batcher.enabled = settings['batch']
+        self._batcher.log = settings['batch_log']
+        self.shadow_enabled = settings['shadow']
+        for shadow in self._shadows.values():
+            shadow.enabled = self.shadow_enabled
+        self.warm_start = settings['warm_start']
+        self.fused_check = settings['fused_check']
+
+        self.profiler.enabled = settings['profile']
+        self.profiler.resize(settings['profile_size'])
+        self.profile_dir = settings['profile_dir']
+
+        self.record = settings['record']
+        self.record_dir = settings['record_dir']
+
+        self.multitone = settings['multitone']
+        self.multitone_span = settings['multitone_span']
+        self.multitone_margin = settings['multitone_margin']
+        self.multitone_search = settings['multitone_search']
+
+        self.list_sweep = settings['list_sweep']
+        self.iip3_dwell = settings['iip3_dwell']
+
+        path = settings['store_path'] or 'results.sqlite'
+        if self.store is not None and (not settings['store'] or self.store.path != path):
+            self.store.close()
+            self.store = None
+        if settings['store'] and self._use_store and self.store is None:
+            self.store = ResultStore(path)
+            atexit.register(self.store.close)
+
+    def acquire(self, owner):
+        """
+        Занимает стенд для owner без ожидания; False -- стенд уже занят (кем -- в busy_owner).
+        Освобождать можно из другого потока: GUI занимает стенд, поток измерения освобождает.
+        """
+        if not self._busy.acquire(blocking=False):
+            return False
+        self.busy_owner = owner
+        return True
+
+    def release(self):
+        self.busy_owner = ''
+        self._busy.release()
+
+    def abort(self):
+        """
+        Прерывает текущие проверку, измерение или поиск приборов; вызывается из любого потока.
+        """
+        print('abort requested')
+        self.cancel.cancel()
 
     def check(self, params):
+        """
+        Проверка наличия образца; итог -- в present, он же возвращается.
+        """
         print(f'call check with {params}')
+        self.cancel.reset()
+        self.reload_config()
+        self.present = False
+        self._heal()
         device, secondary = params
-        self.present = self._check(device, secondary)
+        if self.recorder is not None:
+            self.recorder.mark('check', device, self.serial, self.secondaryParams)
+        self.profiler.clear()
+        self._phase('check')
+        try:
+            self.present = self._check(device, secondary)
+        except BaseException as ex:
+            # прерванная или упавшая проверка не оставляет включённых выходов, следующий сброс -- полный
+            self.present = False
+            self._safe_off()
+            self._needs_reset = True
+            if not isinstance(ex, Cancelled):
+                raise
+            print(f'check cancelled: {ex}')
+            return False
         print('sample pass')
+        return self.present
 
     def _check(self, device, secondary):
         print(f'launch check with {self.deviceParams[device]} {self.secondaryParams}')
@@ -97,7 +418,24 @@ class InstrumentController(QObject):
 
     def _runCheck(self, param, secondary):
         print(f'run check with {param}, {secondary}')
-
+        self.wait_ready('Источник', 'Генератор 1', 'Анализатор')
+        gen1 = self._instruments['Генератор 1']
+        analyzer = self._instruments['Анализатор']
+        try:
+            passed = self._probe(param)
+        finally:
+            gen1.set_output(state='OFF')
+            self._instruments['Источник'].set_output(chan=1, state='OFF')
+        if not self.warm_start:
+            analyzer.remove_marker(marker=1)
+            gen1.set_modulation(state='ON')
+            analyzer.set_autocalibrate(state='ON')
+        self._flush()
+        return passed
+
+    def _probe(self, param):
+        # питание, генератор 1 и анализатор настраиваются под проверку наличия образца;
+        # выходы остаются включёнными, их выключает вызывающий
         source = self._instruments['Источник']
         gen1 = self._instruments['Генератор 1']
         analyzer = self._instruments['Анализатор']
@@ -114,7 +452,7 @@ class InstrumentController(QObject):
             source.set_output(chan=1, state='ON')
 
             if not mock_enabled:
-                time.sleep(0.5)
+                self._settle_current(0.5)
                 read_curr = float(source.read_current(chan=1)) * 1_000
 
         f1 = param['F1']
@@ -124,22 +462,14 @@ class InstrumentController(QObject):
         gen1.set_pow(value=pcheck, unit='dBm')
         gen1.set_output(state='ON')
 
-        if not mock_enabled:
-            time.sleep(1)
-
         analyzer.set_autocalibrate(state='OFF')
-        analyzer.set_span(value=self.span, unit='MHz')
+        self._set_span(analyzer)
         analyzer.set_marker_mode(marker=1, mode='POS')
         analyzer.set_measure_center_freq(value=f1, unit='GHz')
         analyzer.set_marker1_x_center(value=f1, unit='GHz')
+        self._settle_marker(1)
         read_pow = analyzer.read_pow(marker=1)
 
-        analyzer.remove_marker(marker=1)
-        gen1.set_output(state='OFF')
-        gen1.set_modulation(state='ON')
-        source.set_output(chan=1, state='OFF')
-        analyzer.set_autocalibrate(state='ON')
-
         if imin is not None:
             pass_current = imin < read_curr < imax
         else:
@@ -147,20 +477,82 @@ class InstrumentController(QObject):
         # read_pow = -10
         return read_pow > level and pass_current
 
-    def measure(self, params):
-        print(f'call measure with {params}')
+    def check_measure(self, params):
+        """
+        Проверка наличия образца первым шагом измерения: питание, генератор 1 и анализатор
+        остаются настроенными после проверки. Итог проверки -- в present, возвращается итог измерения.
+        """
+        return self.measure(params, check=True)
+
+    def measure(self, params, check=False):
+        print(f'call {"check and " if check else ""}measure with {params}')
+        self.cancel.reset()
+        self.reload_config()
+        if check:
+            self.present = False
+            self.profiler.clear()
+        self._heal()
         device, secondary = params
-        res = self._measure(device, secondary)
+        if self.recorder is not None:
+            self.recorder.mark('check_measure' if check else 'measure', device, self.serial, self.secondaryParams)
+        self._settler.stats.clear()
+        self._batcher.reset_stats()
+        self.readings.clear()
+        self.reps.clear()
+        self.result.calculated.clear()
+        started = time.time()
+        self.points.begin(started, device, self.serial)
+        try:
+            res = self._measure(device, secondary, check)
+        except Cancelled as ex:
+            print(f'measure cancelled: {ex}')
+            res = None
+        finally:
+            self._flush()
+        print(f'settle times: {self._settler.stats}')
+        print(f'redundant writes skipped: {self._shadow_skipped()}')
+        self._batcher.report()
+        self._export_profile(device)
         if res:
             self.result._only_important = self.secondaryParams['important']
+            if self.readings['IIP3']:
+                iip3 = self.readings['IIP3']
+                self.result.calculated['IIP3, дБм'] = round(sum(iip3) / len(iip3), 2)
+            self.result.calculated['Повторов, осн.'] = self.reps.get('important', 0)
+            if 'unimportant' in self.reps:
+                self.result.calculated['Повторов, доп.'] = self.reps['unimportant']
             self.result.raw_data = [device]
-
-    def _measure(self, device, secondary):
+            for header, value in zip(self.result.headers, self.result.data):
+                self.points.value(header, value)
+            if self.store is not None:
+                self.store.add(started, device, self.serial, self.lot,
+                               dict(zip(self.result.headers, self.result.data)))
+        return bool(res)
+
+    def _measure(self, device, secondary, check=False):
         param = self.deviceParams[device]
-        dev_type = int(device[-2:])
         secondary = self.secondaryParams
         print(f'launch measure with {param} {secondary}')
+        if check:
+            # как и в _runCheck: сброс генератора 2 доделывается во время проверки
+            self.wait_ready('Источник', 'Генератор 1', 'Анализатор')
+        else:
+            self.wait_ready()
+
+        try:
+            res = self._run_measure(device, param, check)
+        except BaseException:
+            # прерванное или упавшее измерение не оставляет включённых выходов
+            self._safe_off()
+            self._phase('teardown')
+            self._teardown(full=True)
+            raise
+        if res:
+            self._phase('teardown')
+            self._teardown()
+        return res
 
+    def _run_measure(self, device, param, check=False):
         source = self._instruments['Источник']
         gen1 = self._instruments['Генератор 1']
         gen2 = self._instruments['Генератор 2']
@@ -170,14 +562,23 @@ class InstrumentController(QObject):
         imax = param['Imax']
         att = param['att']
 
-        if imin is not None:
+        if check:
+            # ток потребления проверен вместе с наличием образца, питание остаётся включённым
+            self._phase('check')
+            self.present = self.result.init() and self._probe(param)
+            print('sample pass' if self.present else 'sample not found')
+            if not self.present:
+                self._output_off('Генератор 1')
+                self._output_off('Источник')
+                return None
+        elif imin is not None:
+            self._phase('supply')
             source.send(f'DISPlay:WIND:TEXT "REMOTE"')
             source.set_current(chan=1, value=imax, unit='mA')
             source.set_voltage(chan=1, value=5, unit='V')
             source.set_output(chan=1, state='ON')
 
-            if not mock_enabled:
-                time.sleep(0.5)
+            self._settle_current(0.5)
             read_curr = float(source.read_current(chan=1)) * 1_000
             if mock_enabled:
                 read_curr = 10
@@ -186,144 +587,283 @@ class InstrumentController(QObject):
                 print(f'supply current {read_curr} is bigger than max_current {imax}')
                 return None
 
-        analyzer.set_autocalibrate(state='OFF')
-        analyzer.set_span(value=self.span, unit='MHz')
-        analyzer.set_marker_mode(marker=1, mode='POS')
-        analyzer.send(f':POW:ATT {att}dB')
-
-        gen1.set_modulation(state='OFF')
-        gen1.set_output(state='ON')
-        gen2.set_modulation(state='OFF')
-        gen2.set_output(state='ON')
-
-        for _ in range(5):
-            self._measure_important(param)
-        if not self.secondaryParams['important']:
-            for _ in range(5):
-                self._measure_unimportant(param, dev_type)
-
-        analyzer.send('*RST')
-        gen1.send('*RST')
-        gen2.send('*RST')
-        source.send('*RST')
+        def setup_analyzer():
+            if not check:
+                analyzer.set_autocalibrate(state='OFF')
+                self._set_span(analyzer)
+                analyzer.set_marker_mode(marker=1, mode='POS')
+            analyzer.send(f':POW:ATT {att}dB')
+
+        def setup_gen(gen):
+            gen.set_modulation(state='OFF')
+            gen.set_output(state='ON')
+
+        self._phase('setup')
+        self.wait_ready('Генератор 2')
+        tasks = [setup_analyzer, lambda: setup_gen(gen2)]
+        if not check:
+            tasks.append(lambda: setup_gen(gen1))
+        self._run_parallel(*tasks)
+        self.cancel.check()
+
+        plan = self._plan(device, param)
+        self._phase('important')
+        self._repeat('important', param, lambda: self._measure_important(plan))
+        if plan.unimportant:
+            self._phase('unimportant')
+            self._repeat('unimportant', param, lambda: self._measure_unimportant(plan))
 
         return [1]
 
-    def _measure_important(self, param):
+    def _repeat(self, loop, param, run):
+        # проходы повторяются, пока доверительные интервалы всех показаний цикла не сузятся до допуска
+        self._repeats = Repeats(param['min_reps'], param['max_reps'], param['tolerance'])
+        try:
+            run()
+            while self._repeats.more():
+                run()
+        finally:
+            self.reps[loop] = self._repeats.passes
+            print(f'{loop} loop: {self._repeats}')
+            self._repeats = None
+
+    def _safe_off(self):
+        # каждый выход выключается независимо: ошибка одного прибора не мешает остальным
+        self._finish_pending()
+        for name in OUTPUTS_OFF:
+            if self._instruments.get(name) is None:
+                continue
+            try:
+                self._output_off(name)
+            except Exception as ex:
+                print(f'could not turn {name} output off: {ex}')
+
+    def _output_off(self, name):
+        OUTPUTS_OFF[name](self._instruments[name])
+        self._batcher.flush(name)
+
+    def _phase(self, phase):
+        self.profiler.phase = phase
+        self.cancel.start_phase(phase, self.budgets.get(phase, 0.0))
+
+    def _teardown(self, full=False):
+        def reset(name):
+            self._instruments[name].send('*RST')
+            self._batcher.flush(name)
+
+        def warm(name):
+            if name in OUTPUTS_OFF:
+                self._output_off(name)
+            else:
+                self._batcher.flush(name)
+
+        # прибором управляет один поток: новый сброс -- только после предыдущего
+        self._finish_pending()
+        full = full or not self.warm_start or self._needs_reset
+        self._needs_reset = False
+        if full:
+            self._forget_sweep_time()
+        for name in ['Анализатор', 'Генератор 1', 'Генератор 2', 'Источник']:
+            self._pending[name] = self._teardown_pool.submit(reset if full else warm, name)
+
+        # питание снимается до возврата в любом режиме -- после этого можно менять образец
+        self.wait_ready('Источник')
+        if not self.overlap_teardown:
+            self.wait_ready()
+
+    def reset(self):
+        """
+        Полный сброс всех приборов (*RST) с ожиданием завершения -- на границах партии.
+        """
+        if not self.found:
+            return
+        self.wait_ready()
+        self._teardown(full=True)
+        self.wait_ready()
+
+    def _finish_pending(self):
+        # ошибка прошлого сброса не теряется: о ней сообщается, и следующий сброс -- полный
+        for name in list(self._pending):
+            try:
+                self.wait_ready(name)
+            except Exception as ex:
+                print(f'{name} teardown failed: {ex}')
+                self._needs_reset = True
+
+    def wait_ready(self, *names):
+        for name in names or list(self._pending):
+            future = self._pending.pop(name, None)
+            if future is not None:
+                future.result()
+
+    def _measure_important(self, plan):
         print('measure important')
-        sleep = self.sleep_important
-        gen1 = self._instruments['Генератор 1']
-        gen2 = self._instruments['Генератор 2']
-        analyzer = self._instruments['Анализатор']
+        self._executor.run(plan.important, sleep=self.sleep_important)
 
-        f1 = param['F1']
-        f3 = param['F3']
-        f4 = param['F4']
-        f6 = param['F6']
-        f7 = param['F7']
-        f8 = param['F8']
-        p1 = param['P1']
-        p2 = param['P2']
-
-        gen1.set_freq(value=f1, unit='GHz')
-        gen1.set_pow(value=p1, unit='dBm')
-        gen2.set_freq(value=f4, unit='GHz')
-        gen2.set_pow(value=p2, unit='dBm')
-
-        analyzer.set_measure_center_freq(value=f1, unit='GHz')
-        analyzer.set_marker1_x_center(value=f1, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        analyzer.set_measure_center_freq(value=f4, unit='GHz')
-        analyzer.set_marker1_x_center(value=f4, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        analyzer.set_measure_center_freq(value=f7, unit='GHz')
-        analyzer.set_marker1_x_center(value=f7, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        gen1.set_freq(value=f3, unit='GHz')
-        gen1.set_pow(value=p1, unit='dBm')
-        gen2.set_freq(value=f6, unit='GHz')
-        gen2.set_pow(value=p2, unit='dBm')
-
-        analyzer.set_measure_center_freq(value=f3, unit='GHz')
-        analyzer.set_marker1_x_center(value=f3, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        analyzer.set_measure_center_freq(value=f6, unit='GHz')
-        analyzer.set_marker1_x_center(value=f6, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        analyzer.set_measure_center_freq(value=f8, unit='GHz')
-        analyzer.set_marker1_x_center(value=f8, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-    def _measure_unimportant(self, param, dev_type):
+    def _measure_unimportant(self, plan):
         print('measure unimportant')
-        sleep = self.sleep_unimportant
-        gen1 = self._instruments['Генератор 1']
-        gen2 = self._instruments['Генератор 2']
+        self._executor.run(plan.unimportant, sleep=self.sleep_unimportant)
+
+    def _plan(self, device, param):
+        multitone_span = self.multitone_span / 1_000 if self.multitone and not self._multitone_unsupported else 0.0
+        important = self.secondaryParams['important']
+        key = (device, tuple(sorted(param.items())), important, multitone_span, self.multitone_margin)
+        if key not in self._plans:
+            self._plans[key] = compile_plan(param, important, max_span=multitone_span,
+                                            margin=self.multitone_margin / 1_000)
+        return self._plans[key]
+
+    def _step_gen(self, name, freq, pow, sleep):
+        gen = self._instruments[name]
+        gen.set_freq(value=freq, unit='GHz')
+        gen.set_pow(value=pow, unit='dBm')
+
+    def _step_iip3(self, name, fund_freq, im3_freq, other_pow, powers, sleep):
+        # второй генератор остаётся включённым на своей частоте: продукт 2f2 - f1 -- настоящий IM3
+        gen = self._instruments[name]
+        fund = self._power_sweep(gen, fund_freq, fund_freq, powers, sleep)
+        im3 = self._power_sweep(gen, fund_freq, im3_freq, powers, sleep)
+
+        iip3 = calc_iip3(powers, fund, im3, other_pow)
+        print(f'IIP3 fit: {iip3}')
+        self._add_reading('IIP3', iip3['iip3'])
+
+    def _power_sweep(self, gen, freq, read_freq, powers, sleep):
         analyzer = self._instruments['Анализатор']
 
-        f1 = param['F1']
-        f2 = param['F2']
-        f3 = param['F3']
-        f4 = param['F4']
-        f5 = param['F5']
-        f6 = param['F6']
-        f7 = param['F7']
-        f8 = param['F8']
-        p1 = param['P1']
-        p2 = param['P2']
-
-        gen1.set_freq(value=f2, unit='GHz')
-        gen1.set_pow(value=p1, unit='dBm')
-        gen2.set_freq(value=f5, unit='GHz')
-        gen2.set_pow(value=p2, unit='dBm')
-
-        analyzer.set_measure_center_freq(value=f5, unit='GHz')
-        analyzer.set_marker1_x_center(value=f5, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        analyzer.set_measure_center_freq(value=f2, unit='GHz')
-        analyzer.set_marker1_x_center(value=f2, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        # прогон IIP3 по мощности
-        analyzer.set_measure_center_freq(value=f5, unit='GHz')
-        analyzer.set_marker1_x_center(value=f5, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
-
-        gen1.set_freq(value=f2, unit='GHz')
-        gen2.set_freq(value=f5, unit='GHz')
-
-        for gen_pow in range(p2 - 30, (p2 - 2) + 2, 2):
-            gen2.set_pow(value=gen_pow, unit='dBm')
-            if not mock_enabled:
-                time.sleep(sleep)
-
-        analyzer.set_measure_center_freq(value=f5 - 0.005, unit='GHz')
-        analyzer.set_marker1_x_center(value=f5 - 0.005, unit='GHz')
-        if not mock_enabled:
-            time.sleep(sleep)
+        if self.list_sweep and not mock_enabled and not self._list_sweep_unsupported:
+            self._flush()
+            sweep = ListSweep(gen, analyzer, dwell=self.iip3_dwell, flush=self._flush)
+            try:
+                return [float(level) for level in sweep.run(freq, powers, read_freq)]
+            except Exception as ex:
+                print(f'list sweep not supported: {ex}, falling back to step sweep')
+                self._list_sweep_unsupported = True
+            finally:
+                self._sweep_times.clear()
+                self._set_span(analyzer)
+
+        gen.set_freq(value=freq, unit='GHz')
+        levels = list()
+        for gen_pow in powers:
+            self.cancel.check()
+            gen.set_pow(value=gen_pow, unit='dBm')
+            levels.append(self._read_marker(read_freq, sleep))
+        return levels
+
+    def _step_tones(self, *tones, sleep):
+        # тоны, попадающие в одну полосу анализатора, снимаются одной развёрткой,
+        # остальные -- по одному маркером
+        if len(tones) > 1 and not self._multitone_unsupported:
+            try:
+                levels = self._read_sweep([freq for _, freq in tones], sleep)
+            except Exception as ex:
+                print(f'multitone sweep not supported: {ex}, falling back to marker reads')
+                self._multitone_unsupported = True
+            else:
+                for (name, _), level in zip(tones, levels):
+                    self._add_reading(name, level)
+                return
+        for name, freq in tones:
+            self._add_reading(name, self._read_marker(freq, sleep))
+
+    def _add_reading(self, name, value):
+        # в таблицу сразу уходит среднее по уже сделанным повторам
+        readings = self.readings[name]
+        readings.append(value)
+        if self._repeats is not None:
+            self._repeats.add(name, value)
+        self.points.value(f'{name}, дБм' if name != 'IIP3' else 'IIP3 (текущее), дБм',
+                          round(sum(readings) / len(readings), 2))
+
+    def _read_marker(self, freq, sleep):
+        analyzer = self._instruments['Анализатор']
+        analyzer.set_measure_center_freq(value=freq, unit='GHz')
+        analyzer.set_marker1_x_center(value=freq, unit='GHz')
+        value = self._settle_marker(sleep)
+        if value is None:
+            value = float(analyzer.read_pow(marker=1))
+        return value
+
+    def _read_sweep(self, freqs, sleep):
+        analyzer = self._instruments['Анализатор']
+        start, stop = sweep_window(freqs, margin=self.multitone_margin / 1_000)
+
+        try:
+            analyzer.send(f':SENS:FREQ:STAR {start}GHz')
+            analyzer.send(f':SENS:FREQ:STOP {stop}GHz')
+            self._sweep_key = ('window', start, stop)
+            analyzer.set_marker1_x_center(value=freqs[0], unit='GHz')
+            self._settle_marker(sleep)
+
+            trace = analyzer.query(':TRAC:DATA? TRACE1').split(',')
+            levels, _ = extract_tone_powers(trace, start, stop, freqs, search=self.multitone_search / 1_000)
+        finally:
+            self._set_span(analyzer)
+        return [float(level) for level in levels]
+
+    def _shadow_skipped(self):
+        res = {k: v.skipped for k, v in self._shadows.items()}
+        for v in self._shadows.values():
+            v.skipped = 0
+        return res
+
+    def _flush(self):
+        start = time.perf_counter()
+        self._batcher.flush()
+        self.profiler.record('batch', 'flush', (), start, time.perf_counter() - start)
+
+    def _export_profile(self, name):
+        if not self.profile_dir or not self.profiler.enabled:
+            return
+        base = self.profiler.export(self.profile_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{name}')
+        print(f'profile exported to {base}.*')
+
+    def _settle_marker(self, fallback):
+        if mock_enabled:
+            return None
+        self._flush()
+        analyzer = self._instruments['Анализатор']
+        start = time.perf_counter()
+        value = self._settler.wait('marker', lambda: analyzer.read_pow(marker=1), fallback,
+                                   period=self._sweep_time())
+        self.profiler.record('settle', 'marker', (fallback, ), start, self._settler.last_sleep, self._settler.last_sleep)
+        return value
 
-        gen2.set_freq(value=f5 - 0.005, unit='GHz')
-        for gen_pow in range(p2 - 30, (p2 - 2) + 2, 2):
-            gen2.set_pow(value=gen_pow, unit='dBm')
-            if not mock_enabled:
-                time.sleep(sleep)
+    def _set_span(self, analyzer):
+        analyzer.set_span(value=self.span, unit='MHz')
+        self._sweep_key = ('span', self.span)
+
+    def _sweep_time(self):
+        # маркер обновляется раз за развёртку, сравнивать имеет смысл только отсчёты разных развёрток
+        if self._sweep_time_unsupported:
+            return 0.0
+        if self._sweep_key in self._sweep_times:
+            return self._sweep_times[self._sweep_key]
+        try:
+            sweep_time = float(self._instruments['Анализатор'].query(':SENS:SWE:TIME?'))
+        except Exception as ex:
+            print(f'sweep time query not supported: {ex}, settling without sweep sync')
+            self._sweep_time_unsupported = True
+            return 0.0
+        if self._sweep_key is not None:
+            self._sweep_times[self._sweep_key] = sweep_time
+        return sweep_time
+
+    def _forget_sweep_time(self):
+        self._sweep_key = None
+        self._sweep_times.clear()
+
+    def _settle_current(self, fallback):
+        if mock_enabled:
+            return
+        self._flush()
+        source = self._instruments['Источник']
+        start = time.perf_counter()
+        self._settler.wait('current', lambda: source.read_current(chan=1), fallback,
+                           tolerance=self.settle_current_tolerance)
+        self.profiler.record('settle', 'current', (fallback, ), start, self._settler.last_sleep, self._settler.last_sleep)
 
-    @pyqtSlot(dict)
     def on_secondary_changed(self, params):
         self.secondaryParams = params
 
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import namedtuple
+
+Dut = namedtuple('Dut', ['device', 'serial'])
+
+
+def parse_duts(text):
+    """
+    Список образцов партии: по строке на образец, "тип;серийный номер".
+    """
+    duts = list()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        device, _, serial = line.partition(';')
+        duts.append(Dut(device.strip(), serial.strip()))
+    return duts
+
+
+class LotStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = None
+        self.cycles = list()
+        self.passed = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.cycles = list()
+            self.passed = 0
+            self.failed = 0
+
+    def add(self, cycle, passed):
+        with self._lock:
+            self.cycles.append(cycle)
+            if passed:
+                self.passed += 1
+            else:
+                self.failed += 1
+
+    @property
+    def count(self):
+        return len(self.cycles)
+
+    @property
+    def per_hour(self):
+        if not self.started or not self.cycles:
+            return 0.0
+        return len(self.cycles) / (time.perf_counter() - self.started) * 3_600
+
+    @property
+    def mean(self):
+        with self._lock:
+            cycles = list(self.cycles)
+        return sum(cycles) / len(cycles) if cycles else 0.0
+
+    @property
+    def p95(self):
+        with self._lock:
+            cycles = sorted(self.cycles)
+        if not cycles:
+            return 0.0
+        return cycles[min(len(cycles) - 1, int(round(0.95 * (len(cycles) - 1))))]
+
+    def __str__(self):
+        return (f'{self.count} DUT, pass {self.passed}, fail {self.failed}, {self.per_hour:.1f} DUT/h, '
+                f'mean {self.mean:.2f} s, p95 {self.p95:.2f} s')
+
+
+class LotRunner:
+    """
+    Прогон партии: проверка -> измерение -> запись для каждого образца без участия оператора.
+    Сброс приборов после образца идёт в фоне, пока начинается проверка следующего.
+    """
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._stop = threading.Event()
+        self.stats = LotStats()
+        self.current = None
+
+    def stop(self):
+        self._stop.set()
+        self._controller.abort()
+
+    @property
+    def running(self):
+        return self.current is not None
+
+    def run(self, duts, on_dut=None, lot=None):
+        controller = self._controller
+        self._stop.clear()
+        self.stats.start()
+        controller.lot = lot or time.strftime('%Y%m%d-%H%M%S')
+        controller.overlap_teardown = True
+        # партия начинается и заканчивается полным сбросом приборов, между образцами -- тёплый старт
+        controller.reset()
+        try:
+            for dut in duts:
+                if self._stop.is_set():
+                    print('lot stopped')
+                    break
+                self.current = dut
+                start = time.perf_counter()
+
+                controller.serial = dut.serial
+                params = [dut.device, controller.secondaryParams]
+                if controller.fused_check:
+                    passed = controller.check_measure(params) and controller.result.ready
+                else:
+                    controller.check(params)
+                    passed = controller.present and controller.measure(params) and controller.result.ready
+                if not controller.present:
+                    print(f'{dut.serial}: sample not found, skipping')
+
+                self.stats.add(time.perf_counter() - start, passed)
+                print(f'lot: {dut} done, {self.stats}')
+                if on_dut is not None:
+                    on_dut(dut, passed)
+        finally:
+            controller.overlap_teardown = False
+            controller.serial = ''
+            controller.lot = ''
+            controller.wait_ready()
+            controller.reset()
+            self.current = None
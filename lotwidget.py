@@ -0,0 +1,122 @@
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QThreadPool, QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QLabel
+
+from lot import LotRunner, parse_duts
+from measurewidget import MeasureTask
+
+
+class LotWidget(QWidget):
+
+    lotStarted = pyqtSignal()
+    lotFinished = pyqtSignal()
+    dutComplete = pyqtSignal()
+    # завершение партии приходит из потока пула, таймер и кнопки трогаются только в потоке GUI
+    lotTaskFinished = pyqtSignal()
+
+    def __init__(self, parent=None, controller=None):
+        super().__init__(parent=parent)
+
+        self._controller = controller
+        self._runner = LotRunner(controller)
+        self._threads = QThreadPool()
+
+        self._layout = QVBoxLayout()
+        self._editDuts = QPlainTextEdit()
+        self._editDuts.setPlaceholderText('Тип 1;серийный номер\nТип 1;серийный номер\n...')
+        self._btnStart = QPushButton('Запуск партии')
+        self._btnStop = QPushButton('Остановить')
+        self._labelStats = QLabel('')
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self._btnStart)
+        buttons.addWidget(self._btnStop)
+
+        self._layout.addWidget(self._editDuts)
+        self._layout.addLayout(buttons)
+        self._layout.addWidget(self._labelStats)
+        self.setLayout(self._layout)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(500)
+        self._timer.timeout.connect(self.on_timer)
+
+        self.lotTaskFinished.connect(self.lotTaskComplete)
+        self._btnStart.clicked.connect(self.on_btnStart_clicked)
+        self._btnStop.clicked.connect(self.on_btnStop_clicked)
+
+        self._modePreConnect()
+
+    def start(self):
+        duts = parse_duts(self._editDuts.toPlainText())
+        unknown = [d.device for d in duts if d.device not in self._controller.deviceParams]
+        if not duts or unknown:
+            print(f'bad lot list, unknown devices: {unknown}')
+            return
+
+        if not self._controller.acquire('lot'):
+            print(f'station is busy: {self._controller.busy_owner}')
+            return
+
+        print(f'starting lot of {len(duts)}')
+        self._modeDuringLot()
+        self._timer.start()
+        self.lotStarted.emit()
+        self._threads.start(MeasureTask(self._runner.run,
+                                        self._lotDone,
+                                        duts,
+                                        on_dut=self.dutTaskComplete))
+
+    def _lotDone(self):
+        # из потока партии
+        self._controller.release()
+        self.lotTaskFinished.emit()
+
+    def dutTaskComplete(self, dut, passed):
+        self.dutComplete.emit()
+
+    @pyqtSlot()
+    def lotTaskComplete(self):
+        print(f'lot complete: {self._runner.stats}')
+        self._timer.stop()
+        self.on_timer()
+        self._modePreLot()
+        self.lotFinished.emit()
+
+    @pyqtSlot()
+    def on_instrumentsConnected(self):
+        self._modePreLot()
+
+    @pyqtSlot()
+    def on_btnStart_clicked(self):
+        self.start()
+
+    @pyqtSlot()
+    def on_btnStop_clicked(self):
+        self._runner.stop()
+
+    @pyqtSlot()
+    def on_timer(self):
+        stats = self._runner.stats
+        current = self._runner.current
+        self._labelStats.setText(
+            f'Образец: {current.serial if current else "-"}\n'
+            f'Измерено: {stats.count} (годных {stats.passed}, брак {stats.failed})\n'
+            f'Производительность: {stats.per_hour:.1f} шт/ч\n'
+            f'Цикл: среднее {stats.mean:.2f} с, p95 {stats.p95:.2f} с'
+        )
+
+    def _modePreConnect(self):
+        self._btnStart.setEnabled(False)
+        self._btnStop.setEnabled(False)
+        self._editDuts.setEnabled(True)
+
+    def _modePreLot(self):
+        self._btnStart.setEnabled(True)
+        self._btnStop.setEnabled(False)
+        self._editDuts.setEnabled(True)
+
+    def _modeDuringLot(self):
+        self._btnStart.setEnabled(False)
+        self._btnStop.setEnabled(True)
+        self._editDuts.setEnabled(False)
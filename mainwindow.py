@@ -6,6 +6,9 @@ from instrumentcontroller import InstrumentController
 from connectionwidget import ConnectionWidget
 from measuremodel import MeasureModel
 from measurewidget import MeasureWidgetWithSecondaryParameters
+from profilewidget import ProfileWidget
+from lotwidget import LotWidget
+from remoteserver import StationServer
 
 
 class MainWindow(QMainWindow):
@@ -26,21 +29,40 @@ class MainWindow(QMainWindow):
         self._connectionWidget = ConnectionWidget(parent=self, controller=self._instrumentController)
         self._measureWidget = MeasureWidgetWithSecondaryParameters(parent=self, controller=self._instrumentController)
         self._measureModel = MeasureModel(parent=self, controller=self._instrumentController)
+        self._profileWidget = ProfileWidget(parent=self, controller=self._instrumentController)
+        self._lotWidget = LotWidget(parent=self, controller=self._instrumentController)
+
+        settings = self._instrumentController.config.settings
+        if settings['server']:
+            self._server = StationServer(self._instrumentController,
+                                         host=settings['server_host'],
+                                         port=settings['server_port'],
+                                         path=settings['server_path'] or None)
+            self._server.start_in_thread()
 
         # init UI
         self._ui.layInstrs.insertWidget(0, self._connectionWidget)
         self._ui.layInstrs.insertWidget(1, self._measureWidget)
+        self._ui.tabWidget.addTab(self._lotWidget, 'Партия')
+        self._ui.tabWidget.addTab(self._profileWidget, 'Профиль')
 
         self._init()
 
     def _init(self):
         self._connectionWidget.connected.connect(self.on_instrumens_connected)
         self._connectionWidget.connected.connect(self._measureWidget.on_instrumentsConnected)
+        self._connectionWidget.connected.connect(self._lotWidget.on_instrumentsConnected)
+
+        self._lotWidget.lotStarted.connect(self.on_lotStarted)
+        self._lotWidget.lotFinished.connect(self.on_lotFinished)
+        self._lotWidget.dutComplete.connect(self._measureModel.update)
+        self._lotWidget.dutComplete.connect(self.on_measureComplete)
 
         self._measureWidget.secondaryChanged.connect(self._instrumentController.on_secondary_changed)
 
         self._measureWidget.measureComplete.connect(self._measureModel.update)
         self._measureWidget.measureComplete.connect(self.on_measureComplete)
+        self._measureWidget.measureComplete.connect(self._profileWidget.refresh)
 
         self._ui.tableMeasure.setModel(self._measureModel)
 
@@ -53,7 +75,7 @@ class MainWindow(QMainWindow):
         self.resizeTable()
 
     def resizeTable(self):
-        self._ui.tableMeasure.resizeRowsToContents()
+        # высота строк фиксирована в .ui, подгонка по содержимому на длинной истории слишком дорогая
         self._ui.tableMeasure.resizeColumnsToContents()
 
     # event handlers
@@ -64,7 +86,17 @@ class MainWindow(QMainWindow):
     def on_instrumens_connected(self):
         print(f'connected {self._instrumentController}')
 
+    @pyqtSlot()
+    def on_lotStarted(self):
+        self._measureWidget.setEnabled(False)
+
+    @pyqtSlot()
+    def on_lotFinished(self):
+        self._measureWidget.setEnabled(True)
+        self._profileWidget.refresh()
+
     @pyqtSlot()
     def on_measureComplete(self):
         print('meas complete')
         self.refreshView()
+        self._ui.tableMeasure.scrollToBottom()
@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+# запуск измерений без GUI: PyQt5 здесь не импортируется вовсе,
+# openpyxl подгружается только если нужна таблица образцов для MeasureResultMock
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description='Измерение параметров ШПУ без GUI')
+    parser.add_argument('-d', '--device', action='append', default=list(),
+                        help='тип прибора из params.ini, можно указать несколько раз')
+    parser.add_argument('-s', '--serial', default='', help='серийный номер образца')
+    parser.add_argument('--lot', help='файл партии: по строке "тип;серийный номер" на образец')
+    parser.add_argument('--important', action='store_true', help='только основные параметры')
+    parser.add_argument('--no-check', action='store_true', help='не проверять наличие образца')
+    parser.add_argument('--check-only', action='store_true', help='только проверка наличия образца')
+    parser.add_argument('--addr', action='append', default=list(), metavar='ИМЯ=АДРЕС',
+                        help='адрес прибора вместо указанного в instr.ini')
+    parser.add_argument('-o', '--output', help='файл результатов, по умолчанию stdout')
+    parser.add_argument('-f', '--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('-q', '--quiet', action='store_true', help='не выводить журнал работы в stderr')
+    return parser.parse_args(args)
+
+
+def measure_dut(controller, device, serial, check):
+    params = [device, controller.secondaryParams]
+    controller.serial = serial
+    row = {
+        'timestamp': time.time(),
+        'device': device,
+        'serial': serial,
+        'present': None,
+        'passed': False,
+    }
+
+    fused = check is True and controller.fused_check
+    measured = False
+    if fused:
+        measured = controller.check_measure(params)
+    elif check:
+        controller.check(params)
+    else:
+        controller.result.init()
+    if check:
+        row['present'] = controller.present
+        if not controller.present:
+            return row
+
+    if check == 'only':
+        row['passed'] = True
+        return row
+
+    if not fused:
+        measured = controller.measure(params)
+    # показания прерванного или упавшего измерения не выдаются за результат
+    if not measured or not controller.result.ready:
+        if controller.cancel.reason:
+            row['error'] = controller.cancel.reason
+        return row
+    row['passed'] = True
+    row.update(zip(controller.result.headers, controller.result.data))
+    for name, values in controller.readings.items():
+        if values:
+            row[f'{name}, дБм'] = round(sum(values) / len(values), 2)
+    return row
+
+
+def write_rows(rows, fmt, out):
+    if fmt == 'json':
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return
+    fields = list()
+    for row in rows:
+        fields += [k for k in row if k not in fields]
+    writer = csv.DictWriter(out, fieldnames=fields, restval='')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(args):
+    opts = parse_args(args)
+
+    from lot import Dut, parse_duts
+
+    duts = [Dut(d, opts.serial) for d in opts.device]
+    if opts.lot:
+        with open(opts.lot, 'rt', encoding='utf-8') as f:
+            duts += parse_duts(f.read())
+
+    rows = list()
+    with contextlib.ExitStack() as stack:
+        log = stack.enter_context(open(os.devnull, 'wt')) if opts.quiet else sys.stderr
+        stack.enter_context(contextlib.redirect_stdout(log))
+
+        from instrumentcontroller import InstrumentController
+
+        controller = InstrumentController()
+        if not duts:
+            duts = [Dut(next(iter(controller.deviceParams)), opts.serial)]
+        unknown = [d.device for d in duts if d.device not in controller.deviceParams]
+        if unknown:
+            print(f'unknown device types: {unknown}', file=sys.stderr)
+            return 2
+
+        controller.on_secondary_changed({'important': opts.important})
+        controller.connect(dict(a.split('=', 1) for a in opts.addr))
+        if not controller.found:
+            print('connect error, check connection', file=sys.stderr)
+            return 2
+
+        if opts.lot:
+            controller.lot = os.path.splitext(os.path.basename(opts.lot))[0]
+        check = 'only' if opts.check_only else not opts.no_check
+        controller.overlap_teardown = len(duts) > 1
+        try:
+            for dut in duts:
+                rows.append(measure_dut(controller, dut.device, dut.serial, check))
+        finally:
+            controller.overlap_teardown = False
+            controller.wait_ready()
+            if controller.store is not None:
+                controller.store.close()
+
+    if opts.output:
+        with open(opts.output, 'wt', encoding='utf-8', newline='') as f:
+            write_rows(rows, opts.format, f)
+    else:
+        write_rows(rows, opts.format, sys.stdout)
+
+    return 0 if all(r['passed'] for r in rows) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,25 +1,67 @@
-from PyQt5.QtCore import Qt, QAbstractTableModel, QVariant
+import datetime
+
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QVariant, QModelIndex, QTimer
+
+from resulthistory import ResultHistory
 
 
 class MeasureModel(QAbstractTableModel):
+
+    fixedHeaders = ['Время', 'Прибор', 'Серийный номер']
+
     def __init__(self, parent=None, controller=None):
         super().__init__(parent)
 
         self._controller = controller
 
-        self._data = list()
+        self._history = ResultHistory()
         self._headers = list()
 
+        # точки из потока измерения забираются в GUI-потоке по таймеру
+        self._timer = QTimer(self)
+        self._timer.setInterval(100)
+        self._timer.timeout.connect(self.update)
+
+        self._controller.points.attach()
         self._init()
 
     def _init(self):
-        self._headers = self._controller.result.headers
+        self._headers = self.fixedHeaders + self._history.columns
+        self._timer.start()
 
     def update(self):
-        self.beginResetModel()
-        self._init()
-        self._data = self._controller.result.data
-        self.endResetModel()
+        changed = list()
+        for point in self._controller.points.take():
+            if point.kind == 'begin':
+                self._emitChanged(changed)
+                row = len(self._history)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._history.append(point.header, *point.value)
+                self.endInsertRows()
+                continue
+
+            if not len(self._history):
+                continue
+
+            if not self._history.has_column(point.header):
+                col = len(self._headers)
+                self.beginInsertColumns(QModelIndex(), col, col)
+                self._history.add_column(point.header)
+                self._headers.append(point.header)
+                self.endInsertColumns()
+
+            self._history.set(len(self._history) - 1, point.header, point.value)
+            changed.append(self._headers.index(point.header))
+
+        self._emitChanged(changed)
+
+    def _emitChanged(self, changed):
+        if not changed:
+            return
+        row = len(self._history) - 1
+        self.dataChanged.emit(self.index(row, min(changed)), self.index(row, max(changed)), [Qt.DisplayRole])
+        changed.clear()
 
     def headerData(self, section, orientation, role=None):
         if orientation == Qt.Horizontal:
@@ -31,7 +73,7 @@ class MeasureModel(QAbstractTableModel):
     def rowCount(self, parent=None, *args, **kwargs):
         if parent.isValid():
             return 0
-        return 1
+        return len(self._history)
 
     def columnCount(self, parent=None, *args, **kwargs):
         return len(self._headers)
@@ -40,8 +82,16 @@ class MeasureModel(QAbstractTableModel):
         if not index.isValid():
             return QVariant()
         if role == Qt.DisplayRole:
-            try:
-                return QVariant(self._data[index.column()])
-            except LookupError:
+            row, col = index.row(), index.column()
+            if row >= len(self._history) or col >= len(self._headers):
                 return QVariant()
+            if col == 0:
+                ts = self._history.value(row, 'timestamp')
+                return QVariant(datetime.datetime.fromtimestamp(ts).strftime('%d.%m.%Y %H:%M:%S'))
+            if col == 1:
+                return QVariant(str(self._history.value(row, 'device')))
+            if col == 2:
+                return QVariant(str(self._history.value(row, 'serial')))
+            value = self._history.value(row, self._headers[col])
+            return QVariant('-' if np.isnan(value) else float(value))
         return QVariant()
@@ -0,0 +1,132 @@
+from collections import namedtuple
+from itertools import permutations
+
+from tones import group_tones
+
+GEN1 = 'Генератор 1'
+GEN2 = 'Генератор 2'
+
+# kind: 'gen' -- (генератор, частота, мощность)
+#       'tones' -- ((имя, частота), ...) -- тоны одной развёртки анализатора
+#       'iip3' -- (генератор, частота его тона f2, частота продукта 2f2 - f1, мощность тона f1, (мощности, ...))
+Step = namedtuple('Step', ['kind', 'args'])
+
+Plan = namedtuple('Plan', ['important', 'unimportant'])
+
+Segment = namedtuple('Segment', ['gens', 'tones', 'tail'])
+
+# штраф за перестройку одной настройки генератора и за каждый ГГц скачка частоты анализатора
+RETUNE_COST = 1.0
+JUMP_COST = 0.5
+
+
+def compile_plan(param, important_only, max_span=0.0, margin=0.0):
+    """
+    Превращает параметры типа прибора в неизменяемый план измерения.
+    Независимые участки (настройка генераторов + чтение тонов) переставляются так,
+    чтобы при повторных проходах было меньше перестроек и больших скачков частоты.
+    """
+    f, p1, p2 = param, param['P1'], param['P2']
+
+    important = [
+        Segment(((GEN1, f['F1'], p1), (GEN2, f['F4'], p2)), ('F1', 'F4', 'F7'), ()),
+        Segment(((GEN1, f['F3'], p1), (GEN2, f['F6'], p2)), ('F3', 'F6', 'F8'), ()),
+    ]
+    unimportant = list()
+    if not important_only:
+        powers = tuple(range(p2 - 30, (p2 - 2) + 2, 2))
+        unimportant = [
+            Segment(((GEN1, f['F2'], p1), (GEN2, f['F5'], p2)), ('F5', 'F2'),
+                    (Step('iip3', (GEN2, f['F5'], round(abs(2 * f['F5'] - f['F2']), 6), p1, powers)), )),
+        ]
+
+    def compile_phase(segments):
+        segments = [_group(s, param, max_span, margin) for s in segments]
+        return tuple(_flatten(_order(segments)))
+
+    return Plan(compile_phase(important), compile_phase(unimportant))
+
+
+def _group(segment, param, max_span, margin):
+    tones = {name: param[name] for name in segment.tones}
+    if max_span:
+        groups = group_tones(tones, max_span=max_span, margin=margin)
+    else:
+        groups = [[name] for name in segment.tones]
+    groups = tuple(tuple((name, tones[name]) for name in group) for group in groups)
+    return segment._replace(tones=groups)
+
+
+def _center(group):
+    return sum(freq for _, freq in group) / len(group)
+
+
+def _walk(segment, state):
+    gens, analyzer = state
+    cost = 0.0
+    gens = dict(gens)
+    for name, freq, pow in segment.gens:
+        old_freq, old_pow = gens.get(name, (None, None))
+        cost += RETUNE_COST * ((old_freq != freq) + (old_pow != pow))
+        gens[name] = (freq, pow)
+
+    # внутри участка развёртки обходятся от ближайшей к текущей частоте анализатора
+    left = list(segment.tones)
+    order = list()
+    while left:
+        nearest = min(left, key=lambda g: abs(_center(g) - analyzer) if analyzer is not None else 0)
+        if analyzer is not None:
+            cost += JUMP_COST * abs(_center(nearest) - analyzer)
+        analyzer = _center(nearest)
+        order.append(nearest)
+        left.remove(nearest)
+
+    for step in segment.tail:
+        if step.kind == 'iip3':
+            gen, fund, im3, _, powers = step.args
+            cost += JUMP_COST * (abs(fund - analyzer) + abs(im3 - fund))
+            gens[gen] = (fund, powers[-1])
+            analyzer = im3
+
+    return cost, segment._replace(tones=tuple(order)), (tuple(gens.items()), analyzer)
+
+
+def _order(segments):
+    if not segments:
+        return segments
+
+    candidates = permutations(segments) if len(segments) <= 6 else [segments]
+    best, best_cost = None, None
+    for candidate in candidates:
+        # проход повторяется, поэтому считается и переход от конца прохода к его началу
+        state = ((), None)
+        cost, walked = 0.0, list()
+        for segment in list(candidate) + [candidate[0]]:
+            c, s, state = _walk(segment, state)
+            cost += c
+            walked.append(s)
+        if best_cost is None or cost < best_cost:
+            best, best_cost = [walked[-1]] + walked[1:-1], cost
+    return best
+
+
+def _flatten(segments):
+    for segment in segments:
+        for gen in segment.gens:
+            yield Step('gen', gen)
+        for group in segment.tones:
+            yield Step('tones', group)
+        yield from segment.tail
+
+
+class PlanExecutor:
+    def __init__(self, handlers, check=None):
+        self._handlers = handlers
+        # вызывается перед каждым шагом, может прервать план исключением
+        self._check = check
+
+    def run(self, steps, **context):
+        for step in steps:
+            if self._check is not None:
+                self._check()
+            self._handlers[step.kind](*step.args, **context)
@@ -1,8 +1,12 @@
 import os
+import pickle
 import random
 from collections import defaultdict
 
-import openpyxl as openpyxl
+import numpy as np
+
+# разобранные таблицы образцов: (путь, mtime, размер) -> (заголовки, значения по номерам образцов)
+_xlsx_cache = dict()
 
 
 class MeasureResult:
@@ -10,6 +14,7 @@ class MeasureResult:
     def __init__(self):
         self.headers = []
         self._raw_data = list()
+        self.calculated = dict()
 
     def init(self):
         self._clear()
@@ -17,6 +22,12 @@ class MeasureResult:
 
     def _clear(self):
         self._raw_data.clear()
+        self.calculated.clear()
+
+    def _append_calculated(self):
+        # расчётные величины (IIP3 и т.п.) идут отдельными столбцами после измеренных
+        self.headers = self.headers + list(self.calculated.keys())
+        self._raw_data = self._raw_data + list(self.calculated.values())
 
     def generateValue(self, data):
         if data:
@@ -45,12 +56,15 @@ class MeasureResult:
     @raw_data.setter
     def raw_data(self, data):
         self._raw_data = data
+        self._append_calculated()
 
 
 class MeasureResultMock(MeasureResult):
     def __init__(self):
         super().__init__()
         self._gens = defaultdict(dict)
+        # заголовки таблицы образцов как есть: self.headers урезается и дополняется расчётными
+        self._table_headers = list()
         self._only_important = True
         self._important_cols = (0, 1, 2, 3, 4, 9)
 
@@ -66,16 +80,10 @@ class MeasureResultMock(MeasureResult):
         return [f for f in os.listdir('.') if os.path.isfile(f) and f.endswith('.xlsx')]
 
     def _parse_xlsx(self, file):
-        wb = openpyxl.load_workbook(file)
-        ws = wb.active
-
-        rows = list(ws.rows)
-        self.headers = [row.value for row in rows[0][2:]]
-
-        for i in range(1, len(rows), 3):
-            index = rows[i][0].value
-            for j in range(2, ws.max_column):
-                self._gens[index][rows[0][j].value] = [rows[i][j].value, rows[i + 1][j].value, rows[i + 2][j].value]
+        headers, gens = _load_table(file)
+        self._table_headers = list(headers)
+        self.headers = list(headers)
+        self._gens = defaultdict(dict, gens)
 
     @property
     def ready(self):
@@ -92,8 +100,81 @@ class MeasureResultMock(MeasureResult):
         if self._only_important:
             to_gen = list(sorted(set(to_gen).intersection(set(self._important_cols))))
 
-        self.headers = [self.headers[i] for i in to_gen]
+        self.headers = [self._table_headers[i] for i in to_gen]
         self._raw_data = [gen_value(col) for i, col in enumerate(self._gens[index].values()) if i in to_gen]
+        self._append_calculated()
+
+    def generate_rows(self, index, count, seed=None):
+        """
+        Пакет из count синтетических строк результата для образца index -- для нагрузочных проверок
+        хранилища, модели и экспорта. Возвращает заголовки и массив (count, столбцов), '-' -> NaN.
+        """
+        to_gen = self._important_cols if self._only_important else range(10)
+        columns = [col for i, col in enumerate(self._gens[index].items()) if i in to_gen]
+        headers = [header for header, _ in columns]
+        return headers, gen_rows([data for _, data in columns], count, seed)
+
+
+def _table_key(file):
+    stat = os.stat(file)
+    return os.path.abspath(file), stat.st_mtime_ns, stat.st_size
+
+
+def _sidecar_path(file):
+    folder, name = os.path.split(os.path.abspath(file))
+    return os.path.join(folder, f'.{name}.cache')
+
+
+def _load_table(file):
+    """
+    Таблица образцов с кешем в памяти и в двоичном файле рядом с книгой;
+    книга перечитывается, только если изменились её время изменения или размер.
+    """
+    key = _table_key(file)
+    table = _xlsx_cache.get(key)
+    if table is not None:
+        return table
+
+    sidecar = _sidecar_path(file)
+    try:
+        with open(sidecar, 'rb') as f:
+            cached_key, table = pickle.load(f)
+        if cached_key != key:
+            table = None
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        table = None
+
+    if table is None:
+        table = _read_xlsx(file)
+        try:
+            with open(sidecar, 'wb') as f:
+                pickle.dump((key, table), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as ex:
+            print(f'could not write sample table cache: {ex}')
+
+    _xlsx_cache.clear()
+    _xlsx_cache[key] = table
+    return table
+
+
+def _read_xlsx(file):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        width = len(header)
+        headers = list(header[2:])
+
+        gens = dict()
+        # по три строки на образец: разброс, шаг, среднее
+        for group in zip(rows, rows, rows):
+            span, step, mean = (tuple(row) + (None,) * (width - len(row)) for row in group)
+            gens[span[0]] = {header[j]: [span[j], step[j], mean[j]] for j in range(2, width)}
+    finally:
+        wb.close()
+    return headers, gens
 
 
 def gen_value(data):
@@ -107,3 +188,27 @@ def gen_value(data):
     if span == 0 or step == 0:
         return mean
     return round(random.randint(0, int((stop - start) / step)) * step + start, 2)
+
+
+def gen_rows(table, count, seed=None):
+    """
+    Векторный аналог gen_value: count строк по столбцам table ([разброс, шаг, среднее]) за один вызов.
+    seed -- число или np.random.Generator для воспроизводимости.
+    """
+    spans = np.zeros(len(table))
+    steps = np.zeros(len(table))
+    means = np.full(len(table), np.nan)
+    for i, data in enumerate(table):
+        if not data or '-' in data:
+            continue
+        spans[i], steps[i], means[i] = data
+
+    variable = (spans != 0) & (steps != 0)
+    highs = np.zeros(len(table), dtype=np.int64)
+    # (stop - start) / step, как в gen_value: 2 * span / step округляется иначе
+    highs[variable] = (((means + spans) - (means - spans))[variable] / steps[variable]).astype(np.int64)
+    starts = np.where(variable, means - spans, means)
+
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, highs + 1, size=(count, len(table))) * steps + starts
+    return np.round(values, 2)
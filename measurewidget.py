@@ -15,8 +15,10 @@ class MeasureTask(QRunnable):
         self.kwargs = kwargs
 
     def run(self):
-        self.fn(*self.args, **self.kwargs)
-        self.end()
+        try:
+            self.fn(*self.args, **self.kwargs)
+        finally:
+            self.end()
 
 
 class MeasureWidget(QWidget):
@@ -24,6 +26,9 @@ class MeasureWidget(QWidget):
     selectedChanged = pyqtSignal(str)
     sampleFound = pyqtSignal()
     measureComplete = pyqtSignal()
+    # итог задачи приходит из потока пула, кнопки трогаются только в потоке GUI
+    checkTaskFinished = pyqtSignal(bool)
+    measureTaskFinished = pyqtSignal(bool)
 
     def __init__(self, parent=None, controller=None):
         super().__init__(parent=parent)
@@ -38,16 +43,41 @@ class MeasureWidget(QWidget):
 
         self._selectedDevice = self._devices.selected
 
+        self.checkTaskFinished.connect(self.checkTaskComplete)
+        self.measureTaskFinished.connect(self.measureTaskComplete)
+
+    def _start(self, fn, finished, *args):
+        # стенд занимается в потоке GUI и освобождается в потоке задачи перед сигналом finished
+        # с итогом fn (False и при исключении)
+        if not self._controller.acquire('GUI'):
+            print(f'station is busy: {self._controller.busy_owner}')
+            return False
+
+        passed = [False]
+
+        def run(*args):
+            passed[0] = bool(fn(*args))
+
+        def done():
+            self._controller.release()
+            finished.emit(passed[0])
+
+        self._threads.start(MeasureTask(run, done, *args))
+        return True
+
     def check(self):
         print('checking...')
-        self._modeDuringCheck()
-        self._threads.start(MeasureTask(self._controller.check,
-                                        self.checkTaskComplete,
-                                        self._selectedDevice))
+        if self._start(self._controller.check, self.checkTaskFinished, self._selectedDevice):
+            self._modeDuringCheck()
 
-    def checkTaskComplete(self):
+    @pyqtSlot(bool)
+    def checkTaskComplete(self, passed):
         print('check complete')
-        if not self._controller.present:
+        if self._controller.cancel.cancelled:
+            print(f'check aborted: {self._controller.cancel.reason}')
+            self._modePreCheck()
+            return
+        if not passed:
             print('task table not found or sample not connected')
             self._modePreCheck()
             return
@@ -58,16 +88,20 @@ class MeasureWidget(QWidget):
 
     def measure(self):
         print('measuring...')
-        self._modeDuringMeasure()
-        self._threads.start(MeasureTask(self._controller.measure,
-                                        self.measureTaskComplete,
-                                        self._selectedDevice))
+        if self._start(self._controller.measure, self.measureTaskFinished, self._selectedDevice):
+            self._modeDuringMeasure()
 
-    def measureTaskComplete(self):
+    @pyqtSlot(bool)
+    def measureTaskComplete(self, passed):
         print('measure complete')
-        # TODO check if measure completed successfully?
-        if not self._controller.result.ready:
+        if self._controller.cancel.cancelled:
+            print(f'measure aborted: {self._controller.cancel.reason}')
+            self._modePreCheck()
+            return
+
+        if not passed or not self._controller.result.ready:
             print('error during measurement')
+            self._modePreCheck()
             return
 
         self._modePreCheck()
@@ -87,6 +121,14 @@ class MeasureWidget(QWidget):
         print('start measure')
         self.measure()
 
+    @pyqtSlot()
+    def on_btnAbort_clicked(self):
+        print('abort')
+        if self._controller.busy_owner != 'GUI':
+            print(f'station is busy: {self._controller.busy_owner}')
+            return
+        self._controller.abort()
+
     @pyqtSlot(str)
     def on_selectedChanged(self, value):
         self._selectedDevice = value
@@ -95,26 +137,31 @@ class MeasureWidget(QWidget):
     def _modePreConnect(self):
         self._ui.btnCheck.setEnabled(False)
         self._ui.btnMeasure.setEnabled(False)
+        self._ui.btnAbort.setEnabled(False)
         self._devices.enabled = True
 
     def _modePreCheck(self):
         self._ui.btnCheck.setEnabled(True)
         self._ui.btnMeasure.setEnabled(False)
+        self._ui.btnAbort.setEnabled(False)
         self._devices.enabled = True
 
     def _modeDuringCheck(self):
         self._ui.btnCheck.setEnabled(False)
         self._ui.btnMeasure.setEnabled(False)
+        self._ui.btnAbort.setEnabled(True)
         self._devices.enabled = False
 
     def _modePreMeasure(self):
         self._ui.btnCheck.setEnabled(False)
         self._ui.btnMeasure.setEnabled(True)
+        self._ui.btnAbort.setEnabled(False)
         self._devices.enabled = False
 
     def _modeDuringMeasure(self):
         self._ui.btnCheck.setEnabled(False)
         self._ui.btnMeasure.setEnabled(False)
+        self._ui.btnAbort.setEnabled(True)
         self._devices.enabled = False
 
 
@@ -156,17 +203,13 @@ class MeasureWidgetWithSecondaryParameters(MeasureWidget):
 
     def check(self):
         print('subclass checking...')
-        self._modeDuringCheck()
-        self._threads.start(MeasureTask(self._controller.check,
-                                        self.checkTaskComplete,
-                                        [self._selectedDevice, self._params]))
+        if self._start(self._controller.check, self.checkTaskFinished, [self._selectedDevice, self._params]):
+            self._modeDuringCheck()
 
     def measure(self):
         print('subclass measuring...')
-        self._modeDuringMeasure()
-        self._threads.start(MeasureTask(self._controller.measure,
-                                        self.measureTaskComplete,
-                                        [self._selectedDevice, self._params]))
+        if self._start(self._controller.measure, self.measureTaskFinished, [self._selectedDevice, self._params]):
+            self._modeDuringMeasure()
 
     def on_params_changed(self, value):
         params = {
@@ -0,0 +1,68 @@
+import threading
+from collections import namedtuple
+
+# kind: 'begin' -- начало измерения нового прибора (header -- время, value -- (тип, серийный номер)),
+#       'value' -- значение столбца header
+Point = namedtuple('Point', ['kind', 'header', 'value'])
+
+
+class PointBuffer:
+    """
+    Двойной буфер для передачи точек из потока измерения в GUI:
+    измеритель пишет в задний буфер, GUI забирает передний, подмена -- под замком.
+    Точки копятся, только пока подключён потребитель (attach); подписчики получают их всегда.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._back = list()
+        self._front = list()
+        self._listeners = list()
+        self._consumers = 0
+
+    def attach(self):
+        """
+        Подключение потребителя, забирающего точки через take().
+        """
+        with self._lock:
+            self._consumers += 1
+
+    def detach(self):
+        with self._lock:
+            self._consumers = max(self._consumers - 1, 0)
+            if not self._consumers:
+                self._back.clear()
+
+    def subscribe(self, listener):
+        """
+        listener(point) вызывается из потока измерения на каждую точку, помимо буфера.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def push(self, kind, header=None, value=None):
+        point = Point(kind, header, value)
+        with self._lock:
+            if self._consumers:
+                self._back.append(point)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(point)
+
+    def begin(self, timestamp, device, serial=''):
+        self.push('begin', timestamp, (device, serial))
+
+    def value(self, header, value):
+        self.push('value', header, value)
+
+    def take(self):
+        with self._lock:
+            self._front, self._back = self._back, self._front
+        batch = list(self._front)
+        self._front.clear()
+        return batch
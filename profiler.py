@@ -0,0 +1,146 @@
+import csv
+import json
+import os
+import time
+from collections import deque, namedtuple, defaultdict
+
+# start -- время начала от perf_counter, duration -- полное время вызова,
+# sleep -- сколько из него ушло на ожидание установления
+Record = namedtuple('Record', ['phase', 'instrument', 'method', 'args', 'start', 'duration', 'sleep'])
+
+# границы гистограммы длительностей, с
+histogram_edges = (0.0, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, float('inf'))
+
+
+class CommandProfiler:
+    def __init__(self, size=100_000, enabled=True):
+        self.enabled = enabled
+        self.phase = ''
+        self._records = deque(maxlen=size)
+        self._origin = time.perf_counter()
+        self._wall_origin = time.time()
+
+    def resize(self, size):
+        if size != self._records.maxlen:
+            self._records = deque(self._records, maxlen=size)
+
+    def clear(self):
+        self._records.clear()
+        self._origin = time.perf_counter()
+        self._wall_origin = time.time()
+
+    def record(self, instrument, method, args, start, duration, sleep=0.0):
+        if self.enabled:
+            self._records.append(Record(self.phase, instrument, method, args, start, duration, sleep))
+
+    @property
+    def records(self):
+        return list(self._records)
+
+    def summary(self):
+        """
+        Сводка по приборам и по фазам: число вызовов, время на шине, время ожидания,
+        среднее, максимум и гистограмма длительностей.
+        """
+        groups = {'instrument': defaultdict(list), 'phase': defaultdict(list)}
+        for r in self.records:
+            groups['instrument'][r.instrument].append(r)
+            groups['phase'][r.phase].append(r)
+
+        res = dict()
+        for kind, by_key in groups.items():
+            for key, records in by_key.items():
+                durations = [r.duration for r in records]
+                hist = [0] * (len(histogram_edges) - 1)
+                for d in durations:
+                    for i in range(len(hist)):
+                        if d < histogram_edges[i + 1]:
+                            hist[i] += 1
+                            break
+                res[(kind, key)] = {
+                    'count': len(records),
+                    'total': sum(durations),
+                    'sleep': sum(r.sleep for r in records),
+                    'mean': sum(durations) / len(durations),
+                    'max': max(durations),
+                    'histogram': hist,
+                }
+        return res
+
+    def _rows(self):
+        for r in self.records:
+            yield {
+                'phase': r.phase,
+                'instrument': r.instrument,
+                'method': r.method,
+                'args': repr(r.args),
+                'start': r.start - self._origin,
+                'duration': r.duration,
+                'sleep': r.sleep,
+            }
+
+    def export_json(self, path):
+        with open(path, 'wt', encoding='utf-8') as f:
+            json.dump({'started': self._wall_origin, 'records': list(self._rows())}, f, ensure_ascii=False)
+
+    def export_csv(self, path):
+        with open(path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=Record._fields)
+            writer.writeheader()
+            writer.writerows(self._rows())
+
+    def export_chrome_trace(self, path):
+        # формат chrome://tracing и Perfetto: по дорожке на прибор
+        tids = dict()
+        events = list()
+        for row in self._rows():
+            tid = tids.setdefault(row['instrument'], len(tids) + 1)
+            events.append({
+                'name': row['method'],
+                'cat': row['phase'],
+                'ph': 'X',
+                'pid': 1,
+                'tid': tid,
+                'ts': row['start'] * 1e6,
+                'dur': row['duration'] * 1e6,
+                'args': {'args': row['args'], 'sleep': row['sleep']},
+            })
+        for name, tid in tids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}})
+        with open(path, 'wt', encoding='utf-8') as f:
+            json.dump({'traceEvents': events}, f, ensure_ascii=False)
+
+    def export(self, folder, name):
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, name)
+        self.export_json(f'{base}.json')
+        self.export_csv(f'{base}.csv')
+        self.export_chrome_trace(f'{base}.trace.json')
+        return base
+
+
+class TimedInstrument:
+    def __init__(self, name, instrument, profiler):
+        self._name = name
+        self._instrument = instrument
+        self._profiler = profiler
+
+    @property
+    def instrument(self):
+        return self._instrument
+
+    def __getattr__(self, item):
+        attr = getattr(self._instrument, item)
+        if not callable(attr) or item.startswith('_'):
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._profiler.record(self._name, item, (args, kwargs), start, time.perf_counter() - start)
+        return timed
+
+    def __repr__(self):
+        return repr(self._instrument)
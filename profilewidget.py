@@ -0,0 +1,53 @@
+from PyQt5.QtCore import pyqtSlot
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
+
+from profiler import histogram_edges
+
+
+class ProfileWidget(QWidget):
+
+    bars = ' ▁▂▃▄▅▆▇█'
+
+    headers = ['Группа', 'Вызовов', 'Всего, с', 'Ожидание, с', 'Среднее, мс', 'Макс, мс',
+               'Гистограмма ' + ' '.join(f'<{e:g}' for e in histogram_edges[1:-1]) + ' >']
+
+    kinds = {
+        'instrument': 'прибор',
+        'phase': 'фаза',
+    }
+
+    def __init__(self, parent=None, controller=None):
+        super().__init__(parent=parent)
+
+        self._controller = controller
+
+        self._layout = QVBoxLayout()
+        self._table = QTableWidget(0, len(self.headers))
+        self._table.setHorizontalHeaderLabels(self.headers)
+        self._table.verticalHeader().setVisible(False)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self._layout.addWidget(self._table)
+
+        self.setLayout(self._layout)
+
+    def _sparkline(self, hist):
+        top = max(hist) or 1
+        return ''.join(self.bars[round(h / top * (len(self.bars) - 1))] for h in hist)
+
+    @pyqtSlot()
+    def refresh(self):
+        summary = self._controller.profiler.summary()
+
+        self._table.setRowCount(len(summary))
+        for row, ((kind, key), stats) in enumerate(sorted(summary.items())):
+            values = [
+                f'{self.kinds[kind]}: {key}',
+                f'{stats["count"]}',
+                f'{stats["total"]:.3f}',
+                f'{stats["sleep"]:.3f}',
+                f'{stats["mean"] * 1_000:.2f}',
+                f'{stats["max"] * 1_000:.2f}',
+                self._sparkline(stats['histogram']),
+            ]
+            for col, value in enumerate(values):
+                self._table.setItem(row, col, QTableWidgetItem(value))
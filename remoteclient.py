@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+
+
+class StationClient:
+    """
+    Клиент удалённого управления стендом (см. remoteserver.py): ответы сопоставляются
+    с запросами по id, события складываются в очередь events.
+    """
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+        self._ids = itertools.count(1)
+        self._waiting = dict()
+        self._reader = None
+        self._writer = None
+        self._task = None
+
+    async def open(self, host='127.0.0.1', port=5025, path=None):
+        if path:
+            self._reader, self._writer = await asyncio.open_unix_connection(path)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._task = asyncio.create_task(self._read())
+        return self
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        if self._task is not None:
+            await self._task
+
+    async def _read(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if 'event' in message:
+                    await self.events.put(message)
+                    continue
+                future = self._waiting.pop(message.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except ConnectionError:
+            pass
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('connection closed'))
+
+    async def call(self, cmd, **kwargs):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write((json.dumps(dict(kwargs, id=request_id, cmd=cmd), ensure_ascii=False) + '\n').encode('utf-8'))
+        await self._writer.drain()
+        reply = await future
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+
+async def _run(opts):
+    client = await StationClient().open(opts.host, opts.port, opts.unix)
+    try:
+        if opts.events:
+            await client.call('subscribe')
+        kwargs = {k: v for k, v in (('device', opts.device), ('serial', opts.serial)) if v is not None}
+        result = await client.call(opts.cmd, **kwargs)
+        while opts.events and not client.events.empty():
+            print(json.dumps(client.events.get_nowait(), ensure_ascii=False))
+        print(json.dumps(result, ensure_ascii=False))
+    finally:
+        await client.close()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Команда стенду через remoteserver.py')
+    parser.add_argument('cmd', choices=['connect', 'check', 'measure', 'check_measure', 'status', 'result', 'abort'])
+    parser.add_argument('-d', '--device')
+    parser.add_argument('-s', '--serial')
+    parser.add_argument('--events', action='store_true', help='вывести события, пришедшие во время команды')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5025)
+    parser.add_argument('--unix', help='путь Unix-сокета вместо TCP')
+    opts = parser.parse_args(args)
+    try:
+        asyncio.run(_run(opts))
+    except RuntimeError as ex:
+        print(f'error: {ex}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
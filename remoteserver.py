@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import sys
+import threading
+
+
+def _json_default(value):
+    # значения из NumPy и прочие скаляры
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+
+
+class StationServer:
+    """
+    Удалённое управление стендом: JSON по строке на сообщение через TCP или Unix-сокет.
+
+    Запрос:  {"id": 1, "cmd": "check", "device": "Тип 1", "serial": "123"}
+    Ответ:   {"id": 1, "ok": true, "result": {...}} или {"id": 1, "ok": false, "error": "..."}
+    Событие: {"event": "begin" | "value" | "started" | "finished", ...} -- подписчикам (cmd "subscribe").
+
+    Команды стенда выполняются по одной в отдельном потоке, остальные ждут своей очереди,
+    кроме "abort", которая прерывает выполняемую;
+    подписчиков на события может быть сколько угодно.
+    Пока стенд занят оператором (GUI, партия), команды стенда и "abort" отклоняются с ошибкой "busy".
+    """
+
+    def __init__(self, controller, host='127.0.0.1', port=5025, path=None):
+        self._controller = controller
+        self.host = host
+        self.port = port
+        self.path = path
+
+        self._commands = {
+            'connect': self._connect,
+            'check': self._check,
+            'measure': self._measure,
+            'check_measure': self._check_measure,
+            'status': self._status,
+            'result': self._result,
+        }
+        self._busy = None
+        self._subscribers = set()
+        self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._loop = None
+        self._server = None
+        self._lock = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._lock = asyncio.Lock()
+        if self.path:
+            self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+            print(f'remote control at {self.path}')
+        else:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+            print(f'remote control at {self.host}:{self.port}')
+        self._controller.points.subscribe(self._on_point)
+        return self._server
+
+    async def stop(self):
+        self._controller.points.unsubscribe(self._on_point)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._worker.shutdown(wait=False)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def start_in_thread(self):
+        """
+        Запуск рядом с GUI: цикл asyncio работает в своём потоке-демоне.
+        """
+        thread = threading.Thread(target=asyncio.run, args=(self.serve_forever(), ),
+                                  name='remote-control', daemon=True)
+        thread.start()
+        return thread
+
+    def _on_point(self, point):
+        # вызывается из потока измерения
+        self._loop.call_soon_threadsafe(self._broadcast, {
+            'event': point.kind,
+            'header': point.header,
+            'value': point.value,
+        })
+
+    def _broadcast(self, message):
+        data = encode(message)
+        for writer in list(self._subscribers):
+            if writer.is_closing():
+                self._subscribers.discard(writer)
+                continue
+            writer.write(data)
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self._handle(line, writer)
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+
+    async def _handle(self, line, writer):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+        except ValueError as ex:
+            return {'id': None, 'ok': False, 'error': f'bad request: {ex}'}
+
+        request_id = request.get('id')
+        cmd = request.get('cmd')
+        if cmd == 'subscribe':
+            self._subscribers.add(writer)
+            return {'id': request_id, 'ok': True, 'result': None}
+        if cmd == 'unsubscribe':
+            self._subscribers.discard(writer)
+            return {'id': request_id, 'ok': True, 'result': None}
+        if cmd == 'abort':
+            # не ждёт очереди: прерывает выполняемую команду, но не чужую
+            owner = self._controller.busy_owner
+            if owner and owner != 'remote':
+                return {'id': request_id, 'ok': False, 'error': f'busy: {owner}'}
+            self._controller.abort()
+            return {'id': request_id, 'ok': True, 'result': {'busy': self._busy}}
+        if cmd not in self._commands:
+            return {'id': request_id, 'ok': False, 'error': f'unknown command {cmd!r}'}
+
+        handler = self._commands[cmd]
+        if cmd in ('status', 'result'):
+            return {'id': request_id, 'ok': True, 'result': handler(request)}
+
+        async with self._lock:
+            if not self._controller.acquire('remote'):
+                return {'id': request_id, 'ok': False, 'error': f'busy: {self._controller.busy_owner}'}
+            self._busy = cmd
+            self._broadcast({'event': 'started', 'cmd': cmd, 'id': request_id})
+            try:
+                result = await self._loop.run_in_executor(self._worker, handler, request)
+            except Exception as ex:
+                print(f'remote {cmd} failed: {ex}')
+                reply = {'id': request_id, 'ok': False, 'error': str(ex)}
+            else:
+                reply = {'id': request_id, 'ok': True, 'result': result}
+            finally:
+                self._busy = None
+                self._controller.release()
+            self._broadcast({'event': 'finished', 'cmd': cmd, 'id': request_id, 'ok': reply['ok']})
+        return reply
+
+    def _params(self, request):
+        controller = self._controller
+        device = request.get('device') or next(iter(controller.deviceParams))
+        if device not in controller.deviceParams:
+            raise ValueError(f'unknown device type {device!r}')
+        controller.serial = str(request.get('serial', ''))
+        if 'important' in request:
+            controller.on_secondary_changed(dict(controller.secondaryParams, important=bool(request['important'])))
+        return [device, controller.secondaryParams]
+
+    def _connect(self, request):
+        controller = self._controller
+        controller.connect(request.get('addrs', dict()))
+        return {'found': controller.found, 'instruments': controller.status if controller.found else []}
+
+    def _check(self, request):
+        controller = self._controller
+        if not controller.found:
+            raise RuntimeError('instruments not connected')
+        controller.check(self._params(request))
+        return {'present': controller.present}
+
+    def _measure(self, request):
+        controller = self._controller
+        if not controller.found:
+            raise RuntimeError('instruments not connected')
+        # результат готовится заново: команда может прийти без check или повториться
+        if not controller.result.init():
+            raise RuntimeError('task table not found')
+        if not controller.measure(self._params(request)):
+            raise RuntimeError(controller.cancel.reason or 'measurement failed')
+        return self._result(request)
+
+    def _check_measure(self, request):
+        controller = self._controller
+        if not controller.found:
+            raise RuntimeError('instruments not connected')
+        measured = controller.check_measure(self._params(request))
+        if not measured and (controller.present or controller.cancel.cancelled):
+            raise RuntimeError(controller.cancel.reason or 'measurement failed')
+        return {'present': controller.present, 'result': self._result(request) if measured else None}
+
+    def _status(self, request):
+        controller = self._controller
+        return {
+            'found': controller.found,
+            'present': controller.present,
+            'busy': self._busy,
+            'owner': controller.busy_owner,
+            'serial': controller.serial,
+            'lot': controller.lot,
+            'devices': list(controller.deviceParams),
+            'instruments': controller.status if controller.found else [],
+        }
+
+    def _result(self, request):
+        result = self._controller.result
+        if not result.ready:
+            return None
+        return {
+            'headers': list(result.headers),
+            'data': list(result.data),
+            'readings': {k: list(v) for k, v in self._controller.readings.items()},
+        }
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Удалённое управление стендом без GUI')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5025)
+    parser.add_argument('--unix', help='путь Unix-сокета вместо TCP')
+    opts = parser.parse_args(args)
+
+    from instrumentcontroller import InstrumentController
+
+    server = StationServer(InstrumentController(), host=opts.host, port=opts.port, path=opts.unix)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,83 @@
+import math
+from collections import defaultdict
+from statistics import NormalDist
+
+# двусторонние квантили распределения Стьюдента для доверительной вероятности 0.95, по числу степеней свободы
+_T95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+        10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 20: 2.086, 25: 2.060,
+        30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980}
+
+
+def t_quantile(dof, confidence=0.95):
+    # между узлами таблицы берётся ближайшее меньшее число степеней свободы:
+    # квантиль выходит не меньше точного, интервал -- не уже
+    if confidence == 0.95 and dof >= 1:
+        return _T95[max(k for k in _T95 if k <= dof)]
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+class RunningStats:
+    """
+    Среднее и дисперсия по алгоритму Уэлфорда, без хранения отсчётов.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else math.inf
+
+    def half_width(self, confidence=0.95):
+        """
+        Полуширина доверительного интервала среднего.
+        """
+        if self.count < 2:
+            return math.inf
+        return t_quantile(self.count - 1, confidence) * math.sqrt(self.variance / self.count)
+
+
+class Repeats:
+    """
+    Повторы прохода измерения: не меньше min_reps и не больше max_reps,
+    досрочная остановка, когда доверительный интервал каждого столбца не шире ±tolerance.
+    tolerance = 0 -- всегда max_reps проходов.
+    """
+
+    def __init__(self, min_reps=5, max_reps=5, tolerance=0.0, confidence=0.95):
+        self.min_reps = min_reps
+        self.max_reps = max_reps
+        self.tolerance = tolerance
+        self.confidence = confidence
+
+        self.passes = 0
+        self.columns = defaultdict(RunningStats)
+
+    def add(self, name, value):
+        self.columns[name].add(float(value))
+
+    def converged(self):
+        if self.passes < self.min_reps or self.tolerance <= 0:
+            return False
+        return all(c.half_width(self.confidence) <= self.tolerance for c in self.columns.values())
+
+    def more(self):
+        """
+        Отмечает завершённый проход; True -- нужен ещё один.
+        """
+        self.passes += 1
+        if self.passes >= self.max_reps:
+            return False
+        return not self.converged()
+
+    def __str__(self):
+        widths = {k: round(c.half_width(self.confidence), 4) for k, c in self.columns.items()}
+        return f'{self.passes} passes, ±{widths}'
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class ResultHistory:
+    """
+    История результатов по всем измеренным приборам в структурированном массиве NumPy.
+    Буфер выделяется заранее и растёт блоками по chunk строк, каждая строка
+    занимает фиксированное число байт. Отсутствующие значения хранятся как NaN.
+    """
+
+    chunk = 4096
+    fixed = [('timestamp', 'f8'), ('device', 'U16'), ('serial', 'U32')]
+
+    def __init__(self):
+        self._columns = list()
+        self._array = np.zeros(self.chunk, dtype=self._dtype())
+        self._size = 0
+
+    def _dtype(self):
+        return np.dtype(self.fixed + [(c, 'f8') for c in self._columns])
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def row_nbytes(self):
+        return self._array.dtype.itemsize
+
+    @property
+    def array(self):
+        return self._array[:self._size]
+
+    def has_column(self, header):
+        return header in self._columns
+
+    def add_column(self, header):
+        # новый столбец -- новый dtype, существующие строки копируются один раз
+        self._columns.append(header)
+        array = np.zeros(len(self._array), dtype=self._dtype())
+        for name in self._array.dtype.names:
+            array[name] = self._array[name]
+        array[header][:] = np.nan
+        self._array = array
+        return len(self._columns) - 1
+
+    def append(self, timestamp, device, serial=''):
+        if self._size == len(self._array):
+            array = np.zeros(len(self._array) + self.chunk, dtype=self._array.dtype)
+            array[:self._size] = self._array
+            self._array = array
+        row = self._size
+        self._array[row] = (timestamp, device, serial, *([np.nan] * len(self._columns)))
+        self._size += 1
+        return row
+
+    def set(self, row, header, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = np.nan
+        self._array[header][row] = value
+
+    def value(self, row, header):
+        return self._array[header][row]
@@ -0,0 +1,126 @@
+import json
+import queue
+import sqlite3
+import threading
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS results ('
+    ' id INTEGER PRIMARY KEY,'
+    ' timestamp REAL NOT NULL,'
+    ' device TEXT NOT NULL,'
+    " serial TEXT NOT NULL DEFAULT '',"
+    " lot TEXT NOT NULL DEFAULT '',"
+    ' data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp)',
+    'CREATE INDEX IF NOT EXISTS results_device ON results (device, timestamp)',
+    'CREATE INDEX IF NOT EXISTS results_serial ON results (serial)',
+    'CREATE INDEX IF NOT EXISTS results_lot ON results (lot, timestamp)',
+]
+
+
+class ResultStore:
+    """
+    Архив результатов в SQLite. Запись идёт через фоновый поток: всё, что накопилось
+    в очереди к моменту записи, уходит одной транзакцией, поток измерения диск не ждёт.
+    """
+
+    def __init__(self, path='results.sqlite', batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.written = 0
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        conn.close()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='result-store', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def add(self, timestamp, device, serial='', lot='', data=None):
+        self._queue.put((timestamp, device, serial, lot, json.dumps(data or dict(), ensure_ascii=False)))
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                rows = [row for row in batch if row is not None]
+                try:
+                    with conn:
+                        conn.executemany(
+                            'INSERT INTO results (timestamp, device, serial, lot, data) VALUES (?, ?, ?, ?, ?)', rows)
+                    self.written += len(rows)
+                except sqlite3.Error as ex:
+                    print(f'result store write error, {len(rows)} results lost: {ex}')
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+                if len(rows) != len(batch):
+                    return
+        finally:
+            conn.close()
+
+    def query(self, start=None, stop=None, device=None, serial=None, lot=None, limit=None):
+        """
+        Результаты за интервал времени [start, stop) с отбором по типу, серийному номеру и партии.
+        """
+        where = list()
+        args = list()
+        if start is not None:
+            where.append('timestamp >= ?')
+            args.append(start)
+        if stop is not None:
+            where.append('timestamp < ?')
+            args.append(stop)
+        for column, value in (('device', device), ('serial', serial), ('lot', lot)):
+            if value is not None:
+                where.append(f'{column} = ?')
+                args.append(value)
+
+        sql = 'SELECT timestamp, device, serial, lot, data FROM results'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY timestamp'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(int(limit))
+
+        conn = self._connect()
+        try:
+            return [
+                {'timestamp': ts, 'device': dev, 'serial': ser, 'lot': lt, 'data': json.loads(data)}
+                for ts, dev, ser, lt, data in conn.execute(sql, args)
+            ]
+        finally:
+            conn.close()
+
+    def lots(self):
+        conn = self._connect()
+        try:
+            return [lot for lot, in conn.execute("SELECT DISTINCT lot FROM results WHERE lot != '' ORDER BY lot")]
+        finally:
+            conn.close()
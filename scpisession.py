@@ -0,0 +1,327 @@
+import argparse
+import gzip
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+# Файл сессии -- JSON-строки в gzip:
+#   {"version": 1, "started": <время>, "instruments": {имя: {"addr": ..., "idn": ..., "driver": ...}}}
+#   [t, имя, "w", команда, null, длительность]        -- запись
+#   [t, имя, "q", запрос, ответ, длительность]        -- запрос
+#   [t, null, "mark", действие, [аргументы], 0]       -- вызов check/measure/check_measure контроллера
+# t и длительность -- в секундах от начала сессии.
+VERSION = 1
+
+
+class ReplayMismatch(LookupError):
+    pass
+
+
+class RecordingResource:
+    """
+    Обёртка над VISA-ресурсом: передаёт вызовы дальше и пишет их в сессию.
+    Ставится под BatchingResource, поэтому записываются строки, реально ушедшие на шину.
+    """
+
+    def __init__(self, resource, name, recorder):
+        self._resource = resource
+        self._name = name
+        self._recorder = recorder
+
+    def write(self, command, *args, **kwargs):
+        start = time.perf_counter()
+        res = self._resource.write(command, *args, **kwargs)
+        self._recorder.add(self._name, 'w', command, None, start)
+        return res
+
+    def query(self, question, *args, **kwargs):
+        start = time.perf_counter()
+        reply = self._resource.query(question, *args, **kwargs)
+        self._recorder.add(self._name, 'q', question, reply, start)
+        return reply
+
+    def read(self, *args, **kwargs):
+        start = time.perf_counter()
+        reply = self._resource.read(*args, **kwargs)
+        self._recorder.add(self._name, 'q', '', reply, start)
+        return reply
+
+    def __getattr__(self, item):
+        return getattr(self._resource, item)
+
+
+def describe_driver(instrument):
+    """
+    Класс драйвера и его простые атрибуты -- чтобы при повторе собрать тот же драйвер.
+    Атрибуты с живыми объектами (сессия VISA, описатель прибора) перечисляются в "live".
+    """
+    cls = type(instrument)
+    state, live = dict(), list()
+    for key, value in getattr(instrument, '__dict__', dict()).items():
+        if key == '_inst':
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            live.append(key)
+        else:
+            state[key] = value
+    return {'module': cls.__module__, 'class': cls.__qualname__, 'state': state, 'live': live}
+
+
+def build_driver(spec, channel):
+    """
+    Драйвер записанного класса поверх канала повтора: он шлёт те же строки SCPI, что и при записи.
+    Конструктор не вызывается (он открыл бы сессию VISA), атрибуты восстанавливаются из записи,
+    а _inst и атрибуты с живыми объектами указывают на канал.
+    """
+    cls = importlib.import_module(spec['module'])
+    for part in spec['class'].split('.'):
+        cls = getattr(cls, part)
+    instrument = cls.__new__(cls)
+    instrument.__dict__.update(spec['state'])
+    for key in spec['live']:
+        setattr(instrument, key, channel)
+    instrument._inst = channel
+    return instrument
+
+
+class SessionRecorder:
+    def __init__(self, path, instruments):
+        self.path = path
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'version': VERSION, 'started': time.time(), 'instruments': instruments})
+        self.count = 0
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def attach(self, name, instrument):
+        # запись встаёт под пакетирование команд, если оно уже подключено
+        owner = getattr(instrument, '_inst', None)
+        holder, attr = instrument, '_inst'
+        if owner is not None and hasattr(owner, '_resource') and hasattr(owner, 'flush'):
+            holder, attr = owner, '_resource'
+        resource = getattr(holder, attr, None)
+        if resource is None:
+            return
+        if isinstance(resource, RecordingResource):
+            # сессия прибора пережила переподключение -- пишем в новый файл
+            resource._recorder = self
+            return
+        setattr(holder, attr, RecordingResource(resource, name, self))
+
+    def add(self, name, op, command, reply, start):
+        duration = time.perf_counter() - start
+        with self._lock:
+            if self._file is None:
+                return
+            self._write([round(start - self._origin, 6), name, op, command, reply, round(duration, 6)])
+            self.count += 1
+
+    def mark(self, action, *args):
+        with self._lock:
+            if self._file is None:
+                return
+            self._write([round(time.perf_counter() - self._origin, 6), None, 'mark', action, list(args), 0])
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_session(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != VERSION:
+            raise ValueError(f'{path}: unsupported session version {header.get("version")}')
+        records = [json.loads(line) for line in f if line.strip()]
+    return header, records
+
+
+class ReplayChannel:
+    """
+    Записанный обмен одного прибора. Ответы выдаются по порядку записи; запрос, которого нет
+    на очереди, ищется дальше по записи, а если не найден -- берётся последний ответ на ту же команду.
+    """
+
+    def __init__(self, name, addr, idn, records, speed):
+        self.name = name
+        self.addr = addr
+        self.idn = idn
+        self.model = idn.split(',')[1] if idn and ',' in idn else 'REPLAY'
+        self.speed = speed
+        self._records = deque(records)
+        self._last = dict()
+        self._lock = threading.Lock()
+        self.mismatches = 0
+
+    def _wait(self, duration):
+        if self.speed > 0 and duration > 0:
+            time.sleep(duration / self.speed)
+
+    def _skip_health_checks(self):
+        # проверки связи зависят от времени: пропущенная записанная проверка -- не расхождение
+        while self._records and self._records[0][2] == 'q' and self._records[0][3] == '*IDN?':
+            self._records.popleft()
+
+    def write(self, command):
+        with self._lock:
+            self._skip_health_checks()
+            # совпадение ищется среди идущих подряд записей: новый код мог пропустить часть команд
+            record = None
+            for i, candidate in enumerate(self._records):
+                if candidate[2] != 'w':
+                    break
+                if candidate[3] == command:
+                    self.mismatches += i
+                    for _ in range(i + 1):
+                        record = self._records.popleft()
+                    break
+            if record is None:
+                self.mismatches += 1
+        self._wait(record[5] if record else 0.0)
+        return len(command)
+
+    def query(self, question):
+        with self._lock:
+            # записанную проверку связи берём, только если она следующая по очереди
+            if question == '*IDN?' and self.idn and not (self._records and self._records[0][3] == question):
+                return self.idn
+            if question != '*IDN?':
+                self._skip_health_checks()
+            record = None
+            for i, candidate in enumerate(self._records):
+                if candidate[2] == 'q' and candidate[3] == question:
+                    for _ in range(i + 1):
+                        skipped = self._records.popleft()
+                        if skipped[2] == 'q':
+                            self._last[skipped[3]] = skipped
+                        if skipped is not candidate and skipped[3] != '*IDN?':
+                            self.mismatches += 1
+                    record = candidate
+                    break
+            if record is None:
+                self.mismatches += 1
+                record = self._last.get(question)
+                if record is None:
+                    raise ReplayMismatch(f'{self.name}: {question!r} was never answered in the recorded session')
+        self._wait(record[5])
+        return record[4]
+
+    def read(self):
+        return self.query('')
+
+    def close(self):
+        pass
+
+    @property
+    def remaining(self):
+        return len(self._records)
+
+
+class ReplayPlayer:
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.header, records = read_session(path)
+        self.marks = [r for r in records if r[2] == 'mark']
+        per_instrument = defaultdict(list)
+        for record in records:
+            if record[1] is not None:
+                per_instrument[record[1]].append(record)
+        self.channels = {
+            name: ReplayChannel(name, info.get('addr', ''), info.get('idn'), per_instrument[name], speed)
+            for name, info in self.header['instruments'].items()
+        }
+
+    def driver(self, name):
+        spec = self.header['instruments'][name].get('driver')
+        if spec is None:
+            raise ReplayMismatch(f'{self.path}: no driver recorded for {name}')
+        return build_driver(spec, self.channels[name])
+
+    def report(self):
+        return {
+            name: {'mismatches': c.mismatches, 'unplayed': c.remaining}
+            for name, c in self.channels.items()
+        }
+
+
+# текущая воспроизводимая сессия, её приборы отдаёт ReplayFactory
+player = None
+
+
+class ReplayFactory:
+    def __init__(self, name, addr):
+        self.name = name
+        self.addr = addr
+
+    def find(self):
+        if player is None:
+            raise ReplayMismatch('no replay session loaded')
+        return player.driver(self.name)
+
+
+def replay(path, speed=1.0):
+    """
+    Повтор записанной сессии на текущем коде контроллера: те же подключение, проверки и измерения
+    против записанных ответов приборов. Возвращает время каждого действия и сводку расхождений.
+    """
+    global player
+    from instrumentcontroller import InstrumentController
+
+    player = ReplayPlayer(path, speed)
+    controller = InstrumentController(station='replay', store=False)
+    controller.record = False
+    controller.requiredInstruments = {
+        name: ReplayFactory(name, channel.addr) for name, channel in player.channels.items()
+    }
+    controller.connect(dict())
+    if not controller.found:
+        raise ReplayMismatch('could not connect to the recorded instruments')
+
+    timings = list()
+    for _, _, _, action, args, _ in player.marks:
+        device, serial, secondary = args
+        controller.serial = serial
+        controller.on_secondary_changed(secondary)
+        params = [device, controller.secondaryParams]
+        start = time.perf_counter()
+        if action == 'check':
+            controller.check(params)
+        elif action == 'measure':
+            controller.measure(params)
+        elif action == 'check_measure':
+            controller.check_measure(params)
+        timings.append((action, device, serial, time.perf_counter() - start))
+    controller.wait_ready()
+    return timings, player.report()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Повтор записанной сессии обмена с приборами')
+    parser.add_argument('session', help='файл сессии (.scpi.gz)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='масштаб времени ответов приборов, 0 -- без задержек')
+    opts = parser.parse_args(args)
+
+    timings, report = replay(opts.session, opts.speed)
+    for action, device, serial, elapsed in timings:
+        print(f'{action:8} {device:8} {serial:12} {elapsed:8.3f} s', file=sys.stderr)
+    print(json.dumps({'timings': timings, 'instruments': report}, ensure_ascii=False))
+    return 0 if all(r['mismatches'] == 0 for r in report.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
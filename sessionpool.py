@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+
+
+class InstrumentLost(ConnectionError):
+    """
+    Прибор не отвечает и не переподключился.
+    """
+
+
+class SessionPool:
+    """
+    Открытые сессии приборов, переживающие повторное подключение.
+    Последние рабочие адреса и ответы *IDN? хранятся в файле. Если в прошлый раз прибор
+    нашёлся не по адресу из настроек, а настройки с тех пор не менялись, поиск сразу идёт
+    по последнему рабочему адресу; иначе этот адрес -- запасной после адреса из настроек.
+    Между образцами сессии проверяются одним запросом *IDN?, отвалившийся прибор
+    переподключается отдельно от остальных, с нарастающей паузой между попытками.
+    """
+
+    def __init__(self, path='.sessions.json', attempts=3, backoff=0.5, health_interval=10.0):
+        self.path = path
+        self.attempts = attempts
+        self.backoff = backoff
+        self.health_interval = health_interval
+
+        self._lock = threading.Lock()
+        self._sessions = dict()
+        self._checked = 0.0
+        self._known = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rt', encoding='utf-8') as f:
+                known = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+        return known if isinstance(known, dict) else dict()
+
+    def _save(self):
+        try:
+            with open(self.path, 'wt', encoding='utf-8') as f:
+                json.dump(self._known, f, ensure_ascii=False, indent=2)
+        except OSError as ex:
+            print(f'could not save session info: {ex}')
+
+    def known(self, name):
+        return self._known.get(name, dict())
+
+    def get(self, name, addr):
+        """
+        Открытая исправная сессия прибора name по адресу addr или None.
+        """
+        instrument = self._sessions.get(name)
+        if instrument is None or getattr(instrument, 'addr', addr) != addr:
+            return None
+        return instrument if self.healthy(name) else None
+
+    def open(self, factory, name):
+        start = factory.addr
+        known = self.known(name)
+        last = known.get('addr')
+        # после перехода на последний рабочий адрес фабрика указывает уже на него
+        configured = known.get('configured', start) if start == last else start
+        addrs = [start]
+        if last and last != start:
+            addrs = [last, start] if known.get('configured') == start else [start, last]
+
+        if addrs[0] != start:
+            print(f'{name} last answered at {last}, skipping search at {start}')
+        instrument, idn = None, None
+        for addr in addrs:
+            if addr != addrs[0]:
+                print(f'{name} not found at {addrs[0]}, trying {addr}')
+            factory.addr = addr
+            instrument = self._find(factory)
+            if instrument is None:
+                continue
+            try:
+                idn = _idn(instrument)
+            except Exception as ex:
+                print(f'{name} did not answer *IDN?: {ex}')
+                idn = None
+            # по последнему рабочему адресу годится только тот же прибор
+            if addr == last and addr != configured and idn and known.get('idn') and idn != known['idn']:
+                print(f'{name}: another instrument at {addr}: {idn}')
+                instrument = None
+                continue
+            break
+        if instrument is None:
+            factory.addr = start
+            return None
+
+        with self._lock:
+            self._sessions[name] = instrument
+            self._known[name] = {'addr': factory.addr, 'configured': configured, 'idn': idn, 'time': time.time()}
+            self._save()
+        return instrument
+
+    def _find(self, factory):
+        try:
+            return factory.find()
+        except Exception as ex:
+            print(f'error searching at {factory.addr}: {ex}')
+            return None
+
+    def healthy(self, name):
+        instrument = self._sessions.get(name)
+        if instrument is None:
+            return False
+        try:
+            idn = _idn(instrument)
+        except Exception as ex:
+            print(f'{name} health check failed: {ex}')
+            return False
+        expected = self.known(name).get('idn')
+        return idn is None or expected is None or idn == expected
+
+    def check(self, names, force=False):
+        """
+        Имена приборов, не ответивших на проверку. Проверка не чаще раза в health_interval секунд.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked < self.health_interval:
+            return []
+        self._checked = now
+        return [name for name in names if not self.healthy(name)]
+
+    def reconnect(self, factory, name):
+        self.drop(name)
+        for attempt in range(self.attempts):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            print(f'reconnecting {name}, attempt {attempt + 1} of {self.attempts}')
+            instrument = self.open(factory, name)
+            if instrument is not None:
+                return instrument
+        return None
+
+    def drop(self, name):
+        with self._lock:
+            self._sessions.pop(name, None)
+
+
+def _idn(instrument):
+    query = getattr(instrument, 'query', None)
+    if query is None:
+        # драйвер без сырых запросов -- проверить нечем, считаем исправным
+        return None
+    return str(query('*IDN?')).strip()
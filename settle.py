@@ -0,0 +1,112 @@
+import time
+from collections import defaultdict
+
+
+class SettleStats:
+    def __init__(self):
+        self._times = defaultdict(list)
+        self._timeouts = defaultdict(int)
+
+    def add(self, key, elapsed, timed_out=False):
+        self._times[key].append(elapsed)
+        if timed_out:
+            self._timeouts[key] += 1
+
+    def clear(self):
+        self._times.clear()
+        self._timeouts.clear()
+
+    def worst(self, key):
+        return max(self._times[key], default=0.0)
+
+    def report(self):
+        return {
+            k: {
+                'count': len(v),
+                'mean': sum(v) / len(v),
+                'max': max(v),
+                'timeouts': self._timeouts[k],
+            } for k, v in self._times.items() if v
+        }
+
+    def __str__(self):
+        return ', '.join(f'{k}: mean={v["mean"]:.3f}s max={v["max"]:.3f}s n={v["count"]} timeouts={v["timeouts"]}'
+                         for k, v in self.report().items())
+
+
+class Settler:
+    """
+    Ждёт установления показаний прибора: опрашивает read() до тех пор,
+    пока соседние отсчёты не совпадут в пределах tolerance, но не дольше timeout.
+    Если опрос не поддерживается, выдерживается фиксированная пауза fallback.
+
+    period -- время обновления показаний (развёртка анализатора). Первый отсчёт берётся
+    не раньше чем через period после перестройки, следующие -- не чаще раза за period:
+    повторное чтение той же развёртки дало бы совпадающие устаревшие значения.
+    """
+
+    def __init__(self, tolerance=0.1, interval=0.05, timeout=1.0, stable_count=2, enabled=True, cancel=None):
+        self.tolerance = tolerance
+        self.interval = interval
+        self.timeout = timeout
+        self.stable_count = stable_count
+        self.enabled = enabled
+        # CancelToken: паузы прерываются отменой измерения
+        self.cancel = cancel
+
+        self.stats = SettleStats()
+        self.last_sleep = 0.0
+        self._unsupported = set()
+
+    def wait(self, key, read, fallback, tolerance=None, timeout=None, period=0.0):
+        self.last_sleep = 0.0
+        if not self.enabled or read is None or key in self._unsupported:
+            return self._sleep(key, fallback)
+
+        tolerance = self.tolerance if tolerance is None else tolerance
+        timeout = self.timeout if timeout is None else timeout
+        # на установление нужно не меньше stable_count + 1 обновлений показаний
+        timeout = max(timeout, period * (self.stable_count + 1))
+        interval = max(self.interval, period)
+
+        start = time.perf_counter()
+        if period > 0:
+            self._pause(period)
+            self.last_sleep += period
+        try:
+            last = float(read())
+        except Exception as ex:
+            print(f'settle polling not supported for {key}: {ex}, falling back to {fallback} s')
+            self._unsupported.add(key)
+            return self._sleep(key, fallback)
+
+        stable = 0
+        timed_out = False
+        value = last
+        while stable < self.stable_count:
+            if time.perf_counter() - start >= timeout:
+                timed_out = True
+                break
+            self._pause(interval)
+            self.last_sleep += interval
+            value = float(read())
+            if abs(value - last) <= tolerance:
+                stable += 1
+            else:
+                stable = 0
+            last = value
+
+        self.stats.add(key, time.perf_counter() - start, timed_out)
+        return value
+
+    def _pause(self, duration):
+        if self.cancel is not None:
+            self.cancel.sleep(duration)
+        else:
+            time.sleep(duration)
+
+    def _sleep(self, key, duration):
+        self._pause(duration)
+        self.last_sleep = duration
+        self.stats.add(key, duration)
+        return None
@@ -0,0 +1,94 @@
+import re
+
+
+class ShadowedInstrument:
+    """
+    Прокси над драйвером прибора, хранящий последние записанные настройки.
+    Команда, которая не меняет состояние прибора, не отправляется.
+    """
+
+    # метод драйвера -> имя настройки
+    tracked = {
+        'set_freq': 'freq',
+        'set_pow': 'pow',
+        'set_output': 'output',
+        'set_modulation': 'modulation',
+        'set_span': 'span',
+        'set_marker_mode': 'marker_mode',
+        'set_autocalibrate': 'autocalibrate',
+        'set_measure_center_freq': 'center_freq',
+        'set_marker1_x_center': 'marker1_x',
+        'set_current': 'current',
+        'set_voltage': 'voltage',
+    }
+
+    # аргументы, выбирающие канал или маркер, а не значение настройки
+    selectors = ('chan', 'marker')
+
+    passthrough_prefixes = ('read_', 'query', 'get_')
+
+    re_reset = re.compile(r'^\*RST$', re.IGNORECASE)
+    re_att = re.compile(r'^:?POW(?:er)?:ATT(?:enuation)?\s+(\S+)$', re.IGNORECASE)
+    re_harmless = re.compile(r'^(?::?DISP(?:lay)?:|\*CLS$|\*WAI$)', re.IGNORECASE)
+
+    def __init__(self, instrument, enabled=True):
+        self._instrument = instrument
+        # пока пропуск выключен, теневое состояние всё равно ведётся -- его можно включить на лету
+        self.enabled = enabled
+        self._shadow = dict()
+
+        self.skipped = 0
+
+    @property
+    def instrument(self):
+        return self._instrument
+
+    def invalidate(self):
+        self._shadow.clear()
+
+    def send(self, command):
+        cmd = command.strip()
+        if self.re_reset.match(cmd):
+            self.invalidate()
+            return self._instrument.send(command)
+
+        if self.re_harmless.match(cmd):
+            return self._instrument.send(command)
+
+        match = self.re_att.match(cmd)
+        if match:
+            return self._write(('att', ()), match.group(1).lower(), self._instrument.send, (command, ), {})
+
+        self.invalidate()
+        return self._instrument.send(command)
+
+    def __getattr__(self, item):
+        attr = getattr(self._instrument, item)
+        if not callable(attr) or item.startswith('_') or item.startswith(self.passthrough_prefixes):
+            return attr
+
+        setting = self.tracked.get(item)
+        if setting is None:
+            # неизвестная команда может поменять что угодно
+            def untracked(*args, **kwargs):
+                self.invalidate()
+                return attr(*args, **kwargs)
+            return untracked
+
+        def tracked(*args, **kwargs):
+            selector = tuple((k, kwargs[k]) for k in self.selectors if k in kwargs)
+            value = (args, tuple(sorted((k, v) for k, v in kwargs.items() if k not in self.selectors)))
+            return self._write((setting, selector), value, attr, args, kwargs)
+        return tracked
+
+    def _write(self, key, value, fn, args, kwargs):
+        if self.enabled and key in self._shadow and self._shadow[key] == value:
+            self.skipped += 1
+            return None
+        self._shadow.pop(key, None)
+        res = fn(*args, **kwargs)
+        self._shadow[key] = value
+        return res
+
+    def __repr__(self):
+        return repr(self._instrument)
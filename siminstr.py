@@ -0,0 +1,641 @@
+import math
+import os
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+# модель стенда для отладки без приборов: задержки шины, установление после перестройки,
+# время развёртки анализатора и уровни тонов, зависящие от мощности генераторов
+
+
+units = {
+    'GHZ': 1e9, 'MHZ': 1e6, 'KHZ': 1e3, 'HZ': 1.0,
+    'DBM': 1.0, 'DB': 1.0,
+    'MA': 1e-3, 'A': 1.0, 'V': 1.0,
+    'MS': 1e-3, 'S': 1.0,
+}
+
+re_value = re.compile(r'^([-+]?[0-9.]+(?:E[-+]?[0-9]+)?)\s*([A-Z]*)$', re.IGNORECASE)
+
+
+def parse_value(text):
+    match = re_value.match(text.strip())
+    if not match:
+        return text.strip().upper()
+    number, unit = match.groups()
+    return float(number) * units.get(unit.upper(), 1.0)
+
+
+def db_sum(levels):
+    levels = np.asarray(levels, dtype=float)
+    return 10 * np.log10(np.sum(10 ** (levels / 10), axis=0))
+
+
+class SimDut:
+    """
+    Образец одного типа: ослабление прямого прохождения тона и ток потребления (А).
+    """
+
+    def __init__(self, name='', isolation=30.0, current=0.1):
+        self.name = name
+        self.isolation = isolation
+        self.current = current
+
+
+class SimBench:
+    """
+    Общая модель ИУ: на анализаторе видны прямое прохождение тонов генераторов,
+    продукты смешения f1 +- f2 и продукты третьего порядка 2f1 - f2, 2f2 - f1.
+
+    Образцы строятся по типам из params.ini: прямое прохождение на проверке наличия
+    выше порога level на check_margin дБ, ток -- посередине между Imin и Imax.
+    Оснастка узнаёт тип образца по частоте проверки наличия F1, на которую
+    перестраивается генератор, а ток -- по пределу тока Imax, который проверка
+    выставляет до включения питания; до первой проверки стоит образец по умолчанию.
+    """
+
+    def __init__(self, isolation=30.0, conversion_loss=7.0, iip3=10.0, noise=0.05, noise_floor=-100.0,
+                 idle_current=0.1, seed=None, params='params.ini', check_margin=10.0):
+        self.conversion_loss = conversion_loss
+        self.iip3 = iip3
+        self.noise = noise
+        self.noise_floor = noise_floor
+        self.check_margin = check_margin
+
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.devices = dict()
+
+        self.dut = SimDut('default', isolation, idle_current)
+        self.draw = idle_current
+        # частота проверки наличия в Гц -> образец, предел тока в мА -> ток образца
+        self.duts = None
+        self.currents = dict()
+        self._params = params
+
+    @property
+    def isolation(self):
+        return self.dut.isolation
+
+    def load_params(self, params):
+        """
+        Образцы по разобранному params.ini: {тип: параметры}.
+        """
+        self.duts = dict()
+        self.currents = dict()
+        for name, param in params.items():
+            current = self.dut.current
+            if param['Imin'] is not None and param['Imax'] is not None:
+                current = (param['Imin'] + param['Imax']) / 2 / 1_000
+                self.currents[round(param['Imax'])] = current
+            isolation = param['Pcheck'] - param['level'] - self.check_margin
+            self.duts[round(param['F1'] * 1e9)] = SimDut(name, isolation, current)
+
+    def _load_duts(self):
+        self.duts = dict()
+        if not self._params or not os.path.isfile(self._params):
+            return
+        from config import ConfigError, parse_params
+        try:
+            with open(self._params, 'rt', encoding='utf-8') as f:
+                self.load_params(parse_params(f.read(), self._params))
+        except (OSError, ConfigError) as ex:
+            print(f'sim bench: {ex}, using the default DUT')
+
+    def tuned(self, freq):
+        dut = (self.duts or dict()).get(round(freq))
+        if dut is not None:
+            self.dut = dut
+
+    def limited(self, limit):
+        self.draw = self.currents.get(round(limit * 1_000), self.dut.current)
+
+    def device(self, cls, addr, **kwargs):
+        # один адрес -- один прибор, сколько бы раз ни создавались фабрики
+        with self.lock:
+            if self.duts is None:
+                self._load_duts()
+            device = self.devices.get(addr)
+            if not isinstance(device, cls):
+                device = cls(addr, bench=self, **kwargs)
+                self.devices[addr] = device
+            return device
+
+    @property
+    def generators(self):
+        return [d for d in self.devices.values() if isinstance(d, SimGeneratorDevice)]
+
+    @property
+    def analyzers(self):
+        return [d for d in self.devices.values() if isinstance(d, SimAnalyzerDevice)]
+
+    @property
+    def sources(self):
+        return [d for d in self.devices.values() if isinstance(d, SimSourceDevice)]
+
+    def lines(self, t):
+        gens = [g for g in self.generators if g.output]
+        isolation = self.isolation
+        lines = list()
+        for g in gens:
+            lines.append((g.freq_at(t), g.power_at(t) - isolation))
+        for i, a in enumerate(gens):
+            for b in gens[i + 1:]:
+                fa, fb = a.freq_at(t), b.freq_at(t)
+                pa, pb = a.power_at(t), b.power_at(t)
+                mix = min(pa, pb) - self.conversion_loss
+                lines.append((abs(fa - fb), mix))
+                lines.append((fa + fb, mix))
+                # продукты 3-го порядка проходят тем же путём, что и основные тоны
+                lines.append((abs(2 * fa - fb), 2 * pa + pb - 2 * self.iip3 - isolation))
+                lines.append((abs(2 * fb - fa), 2 * pb + pa - 2 * self.iip3 - isolation))
+        return lines
+
+    def level(self, freqs, t, rbw, att=0.0):
+        freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+        t = np.broadcast_to(np.asarray(t, dtype=float), freqs.shape)
+        levels = [np.full(freqs.shape, self.noise_floor + att)]
+        for tt in np.unique(t):
+            mask = t == tt
+            for freq, power in self.lines(tt):
+                contribution = np.full(freqs.shape, -np.inf)
+                contribution[mask] = power - 3.0 * ((freqs[mask] - freq) / rbw) ** 2
+                levels.append(contribution)
+        with self.lock:
+            noise = np.array([self.random.gauss(0, self.noise) for _ in range(freqs.size)])
+        return db_sum(levels) + noise
+
+    def trigger(self, t):
+        # выход триггера генератора соединён со входом EXT TRIG анализаторов
+        for analyzer in self.analyzers:
+            analyzer.external_trigger(t)
+
+    def current(self, t):
+        on = any(s.output for s in self.sources)
+        drive = sum(10 ** (g.power_at(t) / 10) for g in self.generators if g.output) / 1_000
+        return (self.draw + drive) * on + self.random.gauss(0, 1e-4)
+
+
+bench = SimBench()
+
+
+class SimResource:
+    """
+    Имитация VISA-ресурса: разбирает SCPI-строки и выдерживает задержку шины
+    на каждую запись и чтение.
+    """
+
+    def __init__(self, device, latency=0.002, per_byte=1e-5):
+        self._device = device
+        self.latency = latency
+        self.per_byte = per_byte
+
+    def _wait(self, text):
+        time.sleep(self.latency + self.per_byte * len(text))
+
+    def write(self, command):
+        self._wait(command)
+        for cmd in command.split(';'):
+            cmd = cmd.strip()
+            if cmd:
+                self._device.handle(cmd)
+        return len(command)
+
+    def query(self, question):
+        self._wait(question)
+        reply = None
+        for cmd in question.split(';'):
+            cmd = cmd.strip()
+            if not cmd:
+                continue
+            res = self._device.handle(cmd)
+            if cmd.partition(' ')[0].endswith('?'):
+                reply = res
+        reply = '' if reply is None else str(reply)
+        self._wait(reply)
+        return reply
+
+    def read(self):
+        return ''
+
+    def close(self):
+        pass
+
+
+class SimDevice:
+    model = 'SIM'
+
+    def __init__(self, addr, bench=bench):
+        self.addr = addr
+        self.bench = bench
+        self._commands = list()
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def handle(self, cmd):
+        header, _, arg = cmd.partition(' ')
+        header = header.upper().lstrip(':')
+        if header == '*IDN?':
+            return f'Sim,{self.model},0,1.0'
+        if header == '*RST':
+            self.reset()
+            return None
+        if header in ('*CLS', '*WAI'):
+            return None
+        if header == '*OPC?':
+            self.wait_complete()
+            return '1'
+        for pattern, fn in self._commands:
+            match = pattern.match(header)
+            if match:
+                return fn(*match.groups(), arg.strip())
+        print(f'{self.model} at {self.addr}: unknown command {cmd}')
+        return None
+
+    def wait_complete(self):
+        pass
+
+    def command(self, pattern, fn):
+        self._commands.append((re.compile(pattern + '$'), fn))
+
+
+class SimGeneratorDevice(SimDevice):
+    model = 'SIMGEN'
+
+    def __init__(self, addr, bench=bench, tau_freq=0.03, tau_pow=0.01):
+        self.tau_freq = tau_freq
+        self.tau_pow = tau_pow
+        super().__init__(addr, bench)
+
+        self.command(r'(?:SOUR(?:CE)?:)?FREQ(?:UENCY)?(?::CW|:FIX)?', self._set_freq)
+        self.command(r'(?:SOUR(?:CE)?:)?POW(?:ER)?(?::LEV(?:EL)?)?', self._set_pow)
+        self.command(r'OUTP(?:UT)?(?::STAT(?:E)?)?', self._set_output)
+        self.command(r'OUTP(?:UT)?:MOD(?::STAT(?:E)?)?', self._set_modulation)
+        self.command(r'(?:SOUR(?:CE)?:)?LIST:(TYPE|FREQ|POW|DWEL|TRIG:SOUR)', self._set_list)
+        self.command(r'(?:SOUR(?:CE)?:)?(FREQ|POW):MODE', self._set_mode)
+        self.command(r'INIT(?:IATE)?:CONT(?:INUOUS)?', lambda arg: None)
+        self.command(r'INIT(?:IATE)?(?::IMM(?:EDIATE)?)?', self._init)
+
+    def reset(self):
+        self.freq = 1e9
+        self.output = False
+        self.modulation = True
+        self.list = dict()
+        self.list_mode = False
+        self.list_start = None
+        self._pow = -135.0
+        self._pow_prev = -135.0
+        self._changed = 0.0
+        self._tau = self.tau_pow
+
+    def _list_index(self, t, key):
+        values = self.list.get(key)
+        if not self.list_mode or self.list_start is None or not values:
+            return None
+        index = int((t - self.list_start) // self.list.get('DWEL', 0.01))
+        return index if 0 <= index < len(values) else None
+
+    def freq_at(self, t):
+        index = self._list_index(t, 'FREQ')
+        return self.freq if index is None else self.list['FREQ'][index]
+
+    def power_at(self, t):
+        index = self._list_index(t, 'POW')
+        if index is not None:
+            return self.list['POW'][index]
+        dt = max(t - self._changed, 0.0)
+        return self._pow + (self._pow_prev - self._pow) * math.exp(-dt / self._tau)
+
+    def _retune(self, tau):
+        now = time.perf_counter()
+        self._pow_prev = self.power_at(now) if tau == self.tau_pow else -135.0
+        self._changed = now
+        self._tau = tau
+
+    def _set_freq(self, arg):
+        self._retune(self.tau_freq)
+        self.freq = parse_value(arg)
+        self.bench.tuned(self.freq)
+
+    def _set_pow(self, arg):
+        self._retune(self.tau_pow)
+        self._pow = parse_value(arg)
+
+    def _set_output(self, arg):
+        self._retune(self.tau_pow)
+        self.output = arg.upper() in ('ON', '1')
+
+    def _set_modulation(self, arg):
+        self.modulation = arg.upper() in ('ON', '1')
+
+    def _set_list(self, key, arg):
+        if key in ('FREQ', 'POW'):
+            self.list[key] = [parse_value(v) for v in arg.split(',')]
+        elif key == 'DWEL':
+            self.list[key] = parse_value(arg)
+
+    def _set_mode(self, key, arg):
+        self.list_mode = arg.upper() == 'LIST'
+        if not self.list_mode:
+            self.list_start = None
+            self._retune(self.tau_pow)
+
+    def _init(self, arg):
+        if self.list_mode:
+            self.list_start = time.perf_counter()
+            self.bench.trigger(self.list_start)
+
+
+class SimAnalyzerDevice(SimDevice):
+    model = 'SIMSA'
+
+    def __init__(self, addr, bench=bench, sweep_base=0.01, sweep_per_mhz=0.002, points=601, trigger_timeout=2.0):
+        self.trigger_timeout = trigger_timeout
+        self.sweep_base = sweep_base
+        self.sweep_per_mhz = sweep_per_mhz
+        self.default_points = points
+        super().__init__(addr, bench)
+
+        self.command(r'(?:SENS(?:E)?:)?FREQ(?:UENCY)?:CENT(?:ER)?', self._set_center)
+        self.command(r'(?:SENS(?:E)?:)?FREQ(?:UENCY)?:SPAN', self._set_span)
+        self.command(r'(?:SENS(?:E)?:)?FREQ(?:UENCY)?:STAR(?:T)?', self._set_start)
+        self.command(r'(?:SENS(?:E)?:)?FREQ(?:UENCY)?:STOP', self._set_stop)
+        self.command(r'(?:SENS(?:E)?:)?SWE(?:EP)?:POIN(?:TS)?(\??)', self._points)
+        self.command(r'(?:SENS(?:E)?:)?SWE(?:EP)?:TIME(\??)', self._sweep_time)
+        self.command(r'(?:SENS(?:E)?:)?SWE(?:EP)?:TIME:AUTO', self._set_sweep_auto)
+        self.command(r'(?:SENS(?:E)?:)?POW(?:ER)?(?::RF)?:ATT(?:ENUATION)?', self._set_att)
+        self.command(r'CAL(?:IBRATION)?:AUTO', lambda arg: None)
+        self.command(r'CALC(?:ULATE)?:MARK(?:ER)?(\d):MODE', self._set_marker_mode)
+        self.command(r'CALC(?:ULATE)?:MARK(?:ER)?(\d):STAT(?:E)?', self._set_marker_state)
+        self.command(r'CALC(?:ULATE)?:MARK(?:ER)?(\d):X', self._set_marker_x)
+        self.command(r'CALC(?:ULATE)?:MARK(?:ER)?(\d):Y\?', self._read_marker)
+        self.command(r'INIT(?:IATE)?:CONT(?:INUOUS)?', self._set_continuous)
+        self.command(r'INIT(?:IATE)?(?::IMM(?:EDIATE)?)?', self._init)
+        self.command(r'TRIG(?:GER)?(?::SEQ(?:UENCE)?)?:SOUR(?:CE)?', self._set_trigger_source)
+        self.command(r'TRAC(?:E)?(?::DATA)?\?', self._read_trace)
+        self.command(r'DISP(?:LAY)?:.*', lambda arg: None)
+
+    def reset(self):
+        self.center = 1e9
+        self.span = 1e6
+        self.points = self.default_points
+        self.sweep_time_manual = None
+        self.att = 10.0
+        self.markers = dict()
+        self.continuous = True
+        self.trigger_source = 'IMM'
+        self._armed = False
+        self._sweep_start = time.perf_counter()
+
+    @property
+    def sweep_time(self):
+        if self.sweep_time_manual is not None:
+            return self.sweep_time_manual
+        return self.sweep_base + self.span / 1e6 * self.sweep_per_mhz
+
+    @property
+    def rbw(self):
+        return max(self.span / 100, 1e3)
+
+    def _restart(self):
+        self._sweep_start = time.perf_counter()
+
+    def _last_sweep_end(self):
+        # ждём окончания хотя бы одной полной развёртки после последней перенастройки
+        deadline = time.perf_counter() + self.trigger_timeout
+        while self._armed:
+            if time.perf_counter() > deadline:
+                self._armed = False
+                raise TimeoutError(f'{self.model} at {self.addr}: no external trigger')
+            time.sleep(0.001)
+        start, duration = self._sweep_start, self.sweep_time
+        now = time.perf_counter()
+        first_end = start + duration
+        if now < first_end:
+            time.sleep(first_end - now)
+            return first_end
+        if not self.continuous:
+            return first_end
+        return start + duration * math.floor((now - start) / duration)
+
+    def wait_complete(self):
+        self._last_sweep_end()
+
+    def _set_center(self, arg):
+        self.center = parse_value(arg)
+        self._restart()
+
+    def _set_span(self, arg):
+        self.span = parse_value(arg)
+        self.sweep_time_manual = None if self.span else self.sweep_time_manual
+        self._restart()
+
+    def _set_start(self, arg):
+        stop = self.center + self.span / 2
+        start = parse_value(arg)
+        self.center, self.span = (start + stop) / 2, stop - start
+        self._restart()
+
+    def _set_stop(self, arg):
+        start = self.center - self.span / 2
+        stop = parse_value(arg)
+        self.center, self.span = (start + stop) / 2, stop - start
+        self._restart()
+
+    def _points(self, query, arg):
+        if query:
+            return str(self.points)
+        self.points = int(parse_value(arg))
+        self._restart()
+
+    def _sweep_time(self, query, arg):
+        if query:
+            return f'{self.sweep_time:.6g}'
+        self.sweep_time_manual = parse_value(arg)
+        self._restart()
+
+    def _set_sweep_auto(self, arg):
+        if arg.upper() in ('ON', '1'):
+            self.sweep_time_manual = None
+
+    def _set_att(self, arg):
+        self.att = parse_value(arg)
+
+    def _set_marker_mode(self, marker, arg):
+        self.markers.setdefault(marker, self.center)
+
+    def _set_marker_state(self, marker, arg):
+        if arg.upper() in ('OFF', '0'):
+            self.markers.pop(marker, None)
+        else:
+            self.markers.setdefault(marker, self.center)
+
+    def _set_marker_x(self, marker, arg):
+        self.markers[marker] = parse_value(arg)
+
+    def _set_continuous(self, arg):
+        self.continuous = arg.upper() in ('ON', '1')
+
+    def _init(self, arg):
+        if self.trigger_source == 'EXT':
+            self._armed = True
+        else:
+            self._restart()
+
+    def _set_trigger_source(self, arg):
+        self.trigger_source = parse_value(arg)
+
+    def external_trigger(self, t):
+        if self._armed:
+            self._sweep_start = t
+            self._armed = False
+
+    def _read_marker(self, marker, arg):
+        t = self._last_sweep_end()
+        freq = self.markers.get(marker, self.center)
+        return f'{float(self.bench.level(freq, t, self.rbw, self.att - 10)[0]):.3f}'
+
+    def _read_trace(self, arg):
+        end = self._last_sweep_end()
+        if self.span:
+            freqs = np.linspace(self.center - self.span / 2, self.center + self.span / 2, self.points)
+            times = end
+        else:
+            freqs = np.full(self.points, self.center)
+            times = end - self.sweep_time + np.arange(self.points) * self.sweep_time / self.points
+        levels = self.bench.level(freqs, times, self.rbw, self.att - 10)
+        return ','.join(f'{v:.3f}' for v in levels)
+
+
+class SimSourceDevice(SimDevice):
+    model = 'SIMPS'
+
+    def __init__(self, addr, bench=bench):
+        super().__init__(addr, bench)
+        self.command(r'SOUR(?:CE)?(\d)?:CURR(?:ENT)?', self._set_current)
+        self.command(r'SOUR(?:CE)?(\d)?:VOLT(?:AGE)?', lambda chan, arg: None)
+        self.command(r'OUTP(?:UT)?(\d)?(?::STAT(?:E)?)?', self._set_output)
+        self.command(r'MEAS(?:URE)?(\d)?:CURR(?:ENT)?\?', self._read_current)
+        self.command(r'DISP(?:LAY)?:.*', lambda arg: None)
+
+    def reset(self):
+        self.output = False
+
+    def _set_output(self, chan, arg):
+        self.output = arg.upper() in ('ON', '1')
+
+    def _set_current(self, chan, arg):
+        self.bench.limited(parse_value(arg))
+
+    def _read_current(self, chan, arg):
+        return f'{self.bench.current(time.perf_counter()):.6f}'
+
+
+class SimInstrument:
+    def __init__(self, device, latency=0.002):
+        self._device = device
+        self._inst = SimResource(device, latency=latency)
+
+    @property
+    def addr(self):
+        return self._device.addr
+
+    @property
+    def status(self):
+        return f'{self._device.model} at {self._device.addr}'
+
+    def send(self, command):
+        return self._inst.write(command)
+
+    def query(self, question):
+        return self._inst.query(question)
+
+    def __repr__(self):
+        return self.status
+
+
+class SimGenerator(SimInstrument):
+    def set_freq(self, value, unit='GHz'):
+        return self.send(f':SOUR:FREQ {value}{unit}')
+
+    def set_pow(self, value, unit='dBm'):
+        return self.send(f':SOUR:POW {value}{unit}')
+
+    def set_output(self, state):
+        return self.send(f':OUTP:STAT {state}')
+
+    def set_modulation(self, state):
+        return self.send(f':OUTP:MOD:STAT {state}')
+
+
+class SimAnalyzer(SimInstrument):
+    def set_autocalibrate(self, state):
+        return self.send(f':CAL:AUTO {state}')
+
+    def set_span(self, value, unit='MHz'):
+        return self.send(f':SENS:FREQ:SPAN {value}{unit}')
+
+    def set_measure_center_freq(self, value, unit='GHz'):
+        return self.send(f':SENS:FREQ:CENT {value}{unit}')
+
+    def set_marker_mode(self, marker, mode):
+        return self.send(f':CALC:MARK{marker}:MODE {mode}')
+
+    def set_marker1_x_center(self, value, unit='GHz'):
+        return self.send(f':CALC:MARK1:X {value}{unit}')
+
+    def remove_marker(self, marker):
+        return self.send(f':CALC:MARK{marker}:STAT OFF')
+
+    def read_pow(self, marker):
+        return float(self.query(f':CALC:MARK{marker}:Y?'))
+
+
+class SimSource(SimInstrument):
+    def set_current(self, chan, value, unit='mA'):
+        return self.send(f':SOUR{chan}:CURR {value}{unit}')
+
+    def set_voltage(self, chan, value, unit='V'):
+        return self.send(f':SOUR{chan}:VOLT {value}{unit}')
+
+    def set_output(self, chan, state):
+        return self.send(f':OUTP{chan} {state}')
+
+    def read_current(self, chan):
+        return self.query(f':MEAS{chan}:CURR?')
+
+
+class SimFactory:
+    device_class = SimDevice
+    instrument_class = SimInstrument
+
+    def __init__(self, addr, latency=0.002, bench=bench, **kwargs):
+        self.addr = addr
+        self.latency = latency
+        self._bench = bench
+        self._kwargs = kwargs
+
+    def find(self):
+        device = self._bench.device(self.device_class, self.addr, **self._kwargs)
+        return self.instrument_class(device, latency=self.latency)
+
+
+class SimSourceFactory(SimFactory):
+    device_class = SimSourceDevice
+    instrument_class = SimSource
+
+
+class SimGeneratorFactory(SimFactory):
+    device_class = SimGeneratorDevice
+    instrument_class = SimGenerator
+
+
+class SimAnalyzerFactory(SimFactory):
+    device_class = SimAnalyzerDevice
+    instrument_class = SimAnalyzer
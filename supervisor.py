@@ -0,0 +1,239 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+
+from lot import LotStats, parse_duts
+
+
+def _worker(station, instr, tasks, events):
+    """
+    Процесс стенда: свой InstrumentController со своей картой приборов и своей очередью образцов.
+    Всё, что нужно показать или сохранить, уходит в общую очередь events.
+    """
+    from instrumentcontroller import InstrumentController
+
+    controller = InstrumentController(instr=instr, station=station, store=False)
+    controller.points.subscribe(lambda p: events.put((station, 'point', (p.kind, p.header, p.value))))
+
+    controller.connect(dict())
+    events.put((station, 'connected', {'found': controller.found}))
+    if not controller.found:
+        return
+
+    controller.overlap_teardown = True
+    controller.reset()
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            device, serial, lot = task
+            start = time.perf_counter()
+            controller.serial = serial
+            controller.lot = lot
+            params = [device, controller.secondaryParams]
+            events.put((station, 'started', {'device': device, 'serial': serial}))
+
+            # ошибка одного образца (например, обмена с прибором) не останавливает стенд
+            error = None
+            try:
+                if controller.fused_check:
+                    passed = controller.check_measure(params) and controller.result.ready
+                else:
+                    controller.check(params)
+                    passed = controller.present and controller.measure(params) and controller.result.ready
+            except Exception as ex:
+                print(f'{station}: {serial} failed: {ex}')
+                error = str(ex)
+                passed = False
+            result = None
+            if passed:
+                result = {
+                    'timestamp': time.time(),
+                    'headers': list(controller.result.headers),
+                    'data': [v.item() if hasattr(v, 'item') else v for v in controller.result.data],
+                }
+            events.put((station, 'done', {
+                'device': device,
+                'serial': serial,
+                'lot': lot,
+                'present': controller.present,
+                'passed': bool(passed),
+                'cycle': time.perf_counter() - start,
+                'result': result,
+                'error': error,
+            }))
+    finally:
+        try:
+            controller.overlap_teardown = False
+            controller.wait_ready()
+            controller.reset()
+        finally:
+            events.put((station, 'stopped', dict()))
+
+
+class Supervisor:
+    """
+    Несколько стендов (по стенду на шину GPIB), каждый в своём процессе.
+    Готовые результаты всех стендов сводятся в одно хранилище store (со столбцом "Стенд")
+    и в общий поток событий для подписчиков (subscribe, в main -- файл JSON-строк);
+    ход работы каждого стенда -- в status. Общего вида в GUI нет.
+    """
+
+    def __init__(self, stations, store=None):
+        # stations: {имя стенда: файл приборов}
+        self.stations = dict(stations)
+        self.store = store
+        self.stats = LotStats()
+        self.status = {name: 'starting' for name in self.stations}
+
+        self._context = multiprocessing.get_context('spawn')
+        self._events = self._context.Queue()
+        self._tasks = {name: self._context.Queue() for name in self.stations}
+        self._processes = dict()
+        # невыполненные образцы: всего и по стендам
+        self._outstanding = 0
+        self._pending = {name: 0 for name in self.stations}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._collector = None
+        self._listeners = list()
+
+    def subscribe(self, listener):
+        """
+        listener(station, kind, payload) на каждое событие стендов, из потока-сборщика.
+        """
+        self._listeners.append(listener)
+
+    def start(self):
+        self.stats.start()
+        for name, instr in self.stations.items():
+            process = self._context.Process(target=_worker, args=(name, instr, self._tasks[name], self._events),
+                                            name=f'station-{name}', daemon=True)
+            process.start()
+            self._processes[name] = process
+        self._collector = threading.Thread(target=self._collect, name='supervisor', daemon=True)
+        self._collector.start()
+
+    def submit(self, station, dut, lot=''):
+        with self._lock:
+            self._outstanding += 1
+            self._pending[station] += 1
+        self._tasks[station].put((dut.device, dut.serial, lot))
+
+    def wait(self):
+        with self._idle:
+            self._idle.wait_for(lambda: self._outstanding == 0 or not self._alive())
+
+    def _alive(self):
+        return any(p.is_alive() for p in self._processes.values())
+
+    def stop(self):
+        for tasks in self._tasks.values():
+            tasks.put(None)
+        for process in self._processes.values():
+            process.join()
+        self._events.put(None)
+        if self._collector is not None:
+            self._collector.join()
+
+    def _collect(self):
+        while True:
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                # стенд, процесс которого умер без 'stopped', своих образцов уже не измерит
+                for name, process in self._processes.items():
+                    if not process.is_alive() and self._pending[name]:
+                        print(f'{name}: station process exited with code {process.exitcode}')
+                        self.status[name] = 'died'
+                        self._drop(name)
+                if not self._alive():
+                    with self._idle:
+                        self._idle.notify_all()
+                continue
+            if event is None:
+                return
+            station, kind, payload = event
+            self._handle(station, kind, payload)
+            for listener in self._listeners:
+                listener(station, kind, payload)
+
+    def _drop(self, station):
+        # образцы стенда, который больше не работает, снимаются с ожидания
+        with self._idle:
+            self._outstanding -= self._pending[station]
+            self._pending[station] = 0
+            self._idle.notify_all()
+
+    def _handle(self, station, kind, payload):
+        if kind == 'connected':
+            self.status[station] = 'ready' if payload['found'] else 'connect error'
+            if not payload['found']:
+                print(f'{station}: connect error, check connection')
+                self._drop(station)
+        elif kind == 'started':
+            self.status[station] = f'{payload["device"]} {payload["serial"]}'
+        elif kind == 'done':
+            self.status[station] = 'ready'
+            self.stats.add(payload['cycle'], payload['passed'])
+            result = payload['result']
+            if result is not None and self.store is not None:
+                data = dict(zip(result['headers'], result['data']), Стенд=station)
+                self.store.add(result['timestamp'], payload['device'], payload['serial'], payload['lot'], data)
+            print(f'{station}: {payload["device"]} {payload["serial"]} '
+                  f'{"pass" if payload["passed"] else "fail"}, {self.stats}')
+            with self._idle:
+                self._outstanding -= 1
+                self._pending[station] -= 1
+                self._idle.notify_all()
+        elif kind == 'stopped':
+            self.status[station] = 'stopped'
+            self._drop(station)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Параллельная работа нескольких стендов')
+    parser.add_argument('--station', nargs=3, action='append', required=True,
+                        metavar=('ИМЯ', 'INSTR', 'ПАРТИЯ'),
+                        help='имя стенда, его файл приборов и файл партии ("тип;серийный номер")')
+    parser.add_argument('--lot', default='', help='имя партии для хранилища')
+    parser.add_argument('--no-store', action='store_true', help='не сохранять результаты в results.sqlite')
+    parser.add_argument('-o', '--output', help='файл JSON-строк с результатами')
+    opts = parser.parse_args(args)
+
+    store = None
+    if not opts.no_store:
+        from resultstore import ResultStore
+        store = ResultStore()
+
+    supervisor = Supervisor({name: instr for name, instr, _ in opts.station}, store=store)
+    out = open(opts.output, 'wt', encoding='utf-8') if opts.output else None
+    if out is not None:
+        supervisor.subscribe(lambda station, kind, payload: kind == 'done' and out.write(
+            json.dumps(dict(payload, station=station), ensure_ascii=False) + '\n'))
+
+    lot = opts.lot or time.strftime('%Y%m%d-%H%M%S')
+    supervisor.start()
+    try:
+        for name, _, lot_file in opts.station:
+            with open(lot_file, 'rt', encoding='utf-8') as f:
+                for dut in parse_duts(f.read()):
+                    supervisor.submit(name, dut, lot)
+        supervisor.wait()
+    finally:
+        supervisor.stop()
+        if store is not None:
+            store.close()
+        if out is not None:
+            out.close()
+    print(f'all stations done: {supervisor.stats}')
+    return 0 if supervisor.stats.failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+def group_tones(tones, max_span, margin=0.0):
+    """
+    Разбивает тоны {имя: частота} на минимальное число групп, каждая из которых
+    целиком помещается в одну развёртку анализатора шириной max_span.
+    Частоты и ширины в одних единицах.
+    """
+    usable = max_span - 2 * margin
+    groups = list()
+    start = None
+    for name, freq in sorted(tones.items(), key=lambda t: t[1]):
+        if start is None or freq - start > usable:
+            groups.append([name])
+            start = freq
+        else:
+            groups[-1].append(name)
+    return groups
+
+
+def sweep_window(freqs, margin, min_span=0.0):
+    lo = min(freqs) - margin
+    hi = max(freqs) + margin
+    if hi - lo < min_span:
+        center = (lo + hi) / 2
+        lo, hi = center - min_span / 2, center + min_span / 2
+    return lo, hi
+
+
+def extract_tone_powers(trace, start, stop, freqs, search=0.0):
+    """
+    Уровни тонов из одной трассы анализатора за один проход.
+    Пик ищется в окне +-search вокруг номинальной частоты и уточняется
+    параболической интерполяцией по трём точкам.
+    Возвращает (уровни, частоты пиков).
+    """
+    trace = np.asarray(trace, dtype=float)
+    freqs = np.asarray(freqs, dtype=float)
+    points = len(trace)
+    if points < 3:
+        raise ValueError(f'trace too short: {points} points')
+    step = (stop - start) / (points - 1)
+
+    nominal = np.rint((freqs - start) / step).astype(int)
+    half = max(int(np.ceil(search / step)), 1)
+
+    offsets = np.arange(-half, half + 1)
+    window = np.clip(nominal[:, None] + offsets[None, :], 0, points - 1)
+    peak = window[np.arange(len(freqs)), np.argmax(trace[window], axis=1)]
+
+    inner = np.clip(peak, 1, points - 2)
+    y0 = trace[inner - 1]
+    y1 = trace[inner]
+    y2 = trace[inner + 1]
+    denom = y0 - 2 * y1 + y2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = np.where(denom != 0, 0.5 * (y0 - y2) / denom, 0.0)
+    delta = np.where(peak == inner, np.clip(delta, -0.5, 0.5), 0.0)
+
+    levels = np.where(peak == inner, y1 - 0.25 * (y0 - y2) * delta, trace[peak])
+    return levels, start + (peak + delta) * step